@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Tetrix benchmarks
+
+Headless benchmarks of the *TetrixBoard* game loop, run on the offscreen Qt
+platform so that no display server is needed:
+
+- ``core_pieces_per_s``: pieces per second through the *TetrixGame* rules
+  alone, i.e. ``pieceDropped()`` and ``removeFullLines()``;
+- ``board_pieces_per_s``: the same pieces fed to a *TetrixBoard* through
+  ``step()``, which adds the signals, the dirty regions and the well pixmap
+  updates;
+- ``cached_paints_per_s`` and ``full_paints_per_s``: ``paintEvent()`` of the
+  board rendered into a ``QImage``, with the well pixmap up to date, or
+  rebuilt for every paint;
+- ``blocks_per_step`` and ``peak_bytes_per_step``: the memory blocks a
+  ``step()`` of the board leaves allocated on average, and the highest peak
+  of traced memory over a single ``step()``, as measured by ``tracemalloc``.
+  A step is one item of the script: the actions that place a piece, or the
+  ``TICK`` that follows a line removal.
+
+Every game is scripted: the actions are computed once by a *TetrixAI* on a
+seeded game, and then replayed on every run, so that the runs play exactly
+the same pieces and lines. The results are printed as JSON::
+
+    python benchmarks/tetrixbench.py --save-baseline baseline.json
+    python benchmarks/tetrixbench.py --baseline baseline.json
+
+With ``--baseline`` every result is compared to the stored one, and the exit
+status is 1 when any of them is worse by more than ``--tolerance``.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+        "tutorial"))
+
+from PySide6 import QtCore  # noqa: E402
+from PySide6 import QtGui  # noqa: E402
+from PySide6 import QtWidgets  # noqa: E402
+
+import PySide6  # noqa: E402
+from tetrix import TetrixBoard  # noqa: E402
+from tetrixai import TetrixAI  # noqa: E402
+from tetrixcore import ActionEnum, TetrixGame  # noqa: E402
+
+BOARD_SIZE = QtCore.QSize(302, 662)
+
+
+def scriptGame(seed, numPieces):
+    """Return the actions a *TetrixAI* plays for ``numPieces`` pieces.
+
+    Each item is the tuple of actions of one ``step()``; a ``TICK`` follows
+    every piece that removed lines.
+    """
+    game = TetrixGame(seed, bag=True)
+    game.start()
+    ai = TetrixAI(lookahead=False)
+    script = []
+    while game.isStarted and game.numPiecesDropped < numPieces:
+        actions = tuple(ai.actions(game))
+        game.step(actions)
+        script.append(actions)
+        if game.isWaitingAfterLine:
+            game.step((ActionEnum.TICK,))
+            script.append((ActionEnum.TICK,))
+    return script
+
+
+def newGame(seed):
+    return TetrixGame(seed, bag=True)
+
+
+def newBoard(seed):
+    """Return a board started on a new game and rendered once.
+
+    The well pixmap only exists once the board has been painted, and until
+    then ``step()`` has no pixmap to update.
+    """
+    board = TetrixBoard()
+    board.resize(BOARD_SIZE)
+    board.game = newGame(seed)
+    board.startGame()
+    render(board)
+    return board
+
+
+def render(board, image=None):
+    """Paint ``board`` into ``image``, by default a new one, and return it."""
+    if image is None:
+        image = QtGui.QImage(
+            board.size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+    board.render(image)
+    return image
+
+
+def benchCore(seed, script):
+    game = newGame(seed)
+    game.start()
+    t0 = time.perf_counter()
+    for actions in script:
+        game.step(actions)
+    elapsed = time.perf_counter() - t0
+    return game.numPiecesDropped / elapsed
+
+
+def benchBoard(seed, script):
+    board = newBoard(seed)
+    t0 = time.perf_counter()
+    for actions in script:
+        board.step(actions)
+    elapsed = time.perf_counter() - t0
+    numPieces = board.game.numPiecesDropped
+    board.deleteLater()
+    return numPieces / elapsed
+
+
+def benchPaints(seed, script, numPaints, full):
+    board = newBoard(seed)
+    for actions in script[:len(script) // 2]:
+        board.step(actions)
+    image = render(board)
+    t0 = time.perf_counter()
+    for _ in range(numPaints):
+        if full:
+            board.wellPixmap = None
+        render(board, image)
+    elapsed = time.perf_counter() - t0
+    board.deleteLater()
+    return numPaints / elapsed
+
+
+def benchAllocations(seed, script):
+    """Return the blocks left allocated per step and the highest step peak."""
+    # A first game warms the tile caches up, so that only the steady state
+    # is measured.
+    board = newBoard(seed)
+    for actions in script:
+        board.step(actions)
+    board.game = newGame(seed)
+    board.startGame()
+    render(board)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    peak = 0
+    for actions in script:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        board.step(actions)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff
+        for stat in after.compare_to(before, "lineno"))
+    board.deleteLater()
+    return blocks / len(script), peak
+
+
+def best(measure, repeat):
+    return max(measure() for _ in range(repeat))
+
+
+def runBenchmarks(args):
+    script = scriptGame(args.seed, args.pieces)
+    results = {}
+
+    def record(name, value, unit, better):
+        results[name] = {"value": value, "unit": unit, "better": better}
+
+    record("core_pieces_per_s",
+        best(lambda: benchCore(args.seed, script), args.repeat),
+        "pieces/s", "higher")
+    record("board_pieces_per_s",
+        best(lambda: benchBoard(args.seed, script), args.repeat),
+        "pieces/s", "higher")
+    record("cached_paints_per_s",
+        best(lambda: benchPaints(args.seed, script, args.paints, False),
+            args.repeat),
+        "paints/s", "higher")
+    record("full_paints_per_s",
+        best(lambda: benchPaints(args.seed, script, args.paints, True),
+            args.repeat),
+        "paints/s", "higher")
+    allocations = [benchAllocations(args.seed, script)
+        for _ in range(args.repeat)]
+    record("blocks_per_step", min(blocks for blocks, _ in allocations),
+        "blocks", "lower")
+    record("peak_bytes_per_step", min(peak for _, peak in allocations),
+        "bytes", "lower")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Add the change from ``baseline`` to ``results``; return regressions."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        value = result["value"]
+        base = reference["value"]
+        result["baseline"] = base
+        if base == 0:
+            worse = value > 0 if result["better"] == "lower" else False
+            result["change"] = None
+        else:
+            change = (value - base) / abs(base)
+            result["change"] = change
+            if result["better"] == "higher":
+                worse = change < -tolerance
+            else:
+                worse = change > tolerance
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tetrix benchmarks")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--pieces", type=int, default=300,
+        help="pieces in the scripted game (default: 300)")
+    parser.add_argument("--paints", type=int, default=500,
+        help="paints per paint benchmark (default: 500)")
+    parser.add_argument("--repeat", type=int, default=3,
+        help="runs of every benchmark, the best one counts (default: 3)")
+    parser.add_argument("--baseline", metavar="FILE",
+        help="compare the results to the baseline stored in FILE")
+    parser.add_argument("--save-baseline", metavar="FILE",
+        help="store the results as the baseline in FILE")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+        help="relative slowdown tolerated against the baseline "
+            "(default: 0.1)")
+    parser.add_argument("--output", metavar="FILE",
+        help="write the results into FILE rather than to stdout")
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    report = {
+        "python": platform.python_version(),
+        "pyside6": PySide6.__version__,
+        "platform": platform.platform(),
+        "qpa": app.platformName(),
+        "seed": args.seed,
+        "results": runBenchmarks(args),
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)
+        regressions = compare(report["results"], baseline, args.tolerance)
+        report["regressions"] = regressions
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as stream:
+            json.dump(report, stream, indent=2)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as stream:
+            stream.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(1 if regressions else 0)
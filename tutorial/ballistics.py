@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Ballistics of the CannonField shots
+
+A *Trajectory* holds the parabola of one shot of the *CannonField* of
+tutorials 13 and 14, computed once when the shot is fired: the velocity
+components and the muzzle position come from the angle and the force, and
+time ``t`` runs at 40 timer ticks per second. The position at any tick is
+then a closed-form expression rather than a recomputation of the sines and
+cosines.
+
+Positions are in the cannon frame, x to the right and y up from the bottom
+left corner of the field. The widget queries use the same rounding as
+``CannonField.shotRect()``: the 6x6 shot rectangle is centred on the pixel
+``(round(x), height - 1 - round(y))``, and rectangles are given as inclusive
+``(left, top, right, bottom)`` widget coordinates, so that the answers
+match ``QRect.intersects()`` exactly.
+
+The module has no Qt dependency, so shots can be solved headless.
+"""
+import math
+
+TICKS_PER_SECOND = 40.0
+SHOT_SIZE = 6
+
+
+class Trajectory:
+    """The flight of a shot fired at ``angle`` degrees with ``force``.
+
+    ``muzzle`` is the distance from the cannon pivot to the mouth of the
+    barrel, where the shot starts.
+    """
+
+    def __init__(self, angle, force, gravity, muzzle):
+        radians = angle * math.pi / 180
+        self.angle = angle
+        self.force = force
+        self.gravity = gravity
+        self.vx = force * math.cos(radians)
+        self.vy = force * math.sin(radians)
+        self.x0 = muzzle * math.cos(radians)
+        self.y0 = muzzle * math.sin(radians)
+
+    def position(self, tick):
+        """Return the ``(x, y)`` position of the shot at ``tick``."""
+        t = tick / TICKS_PER_SECOND
+        return (self.x0 + self.vx*t,
+            self.y0 + self.vy*t - 0.5*self.gravity*t*t)
+
+    def center(self, tick, height):
+        """Return the widget pixel the shot rectangle is centred on."""
+        x, y = self.position(tick)
+        return round(x), height - 1 - round(y)
+
+    def shotRect(self, tick, height):
+        """Return the shot rectangle as ``(left, top, right, bottom)``."""
+        x, y = self.center(tick, height)
+        # QRect.moveCenter() puts the extra pixel of an even size on the
+        # right and bottom sides.
+        half = (SHOT_SIZE - 1) // 2
+        return (x - half, y - half,
+            x - half + SHOT_SIZE - 1, y - half + SHOT_SIZE - 1)
+
+    def apex(self):
+        """Return the ``(tick, x, y)`` of the top of the parabola.
+
+        The tick is fractional; a shot fired downwards peaks at tick 0.
+        """
+        t = max(0.0, self.vy / self.gravity) if self.gravity else 0.0
+        tick = t * TICKS_PER_SECOND
+        x, y = self.position(tick)
+        return tick, x, y
+
+    def exitTick(self, width, height):
+        """Return the first tick when the shot is out of the widget.
+
+        That is when the shot rectangle is right of ``width`` or below
+        ``height``, as the field tests it; a shot always comes down, so
+        there is always such a tick.
+        """
+
+        def isOut(tick):
+            left, top, _, _ = self.shotRect(tick, height)
+            return left > width or top > height
+
+        guesses = []
+        if self.vx > 0:
+            guesses.append((width + 3 - self.x0) / self.vx)
+        # The shot is below the field once round(y) < -3.
+        fall = self.solveY(-3.5)
+        if fall:
+            guesses.append(fall[-1])
+        guess = min(guesses) if guesses else 0.0
+        return self.firstTick(isOut, guess * TICKS_PER_SECOND)
+
+    def hitTick(self, rect, height, first=1, last=None):
+        """Return the first tick from ``first`` the shot meets ``rect``.
+
+        ``rect`` is an inclusive ``(left, top, right, bottom)`` widget
+        rectangle. Returns None when the shot does not meet it by ``last``,
+        or at all. The time window is solved on the continuous parabola,
+        then the ticks around it are checked with the exact rounding.
+        """
+        left, top, right, bottom = rect
+        half = (SHOT_SIZE - 1) // 2
+        # Ranges of the shot centre, in the cannon frame, for which the shot
+        # rectangle overlaps the given one.
+        xmin = left - (SHOT_SIZE - 1 - half) - 0.5
+        xmax = right + half + 0.5
+        ymin = height - 1 - (bottom + half) - 0.5
+        ymax = height - 1 - (top - (SHOT_SIZE - 1 - half)) + 0.5
+
+        if self.vx > 0:
+            tx0 = (xmin - self.x0) / self.vx
+            tx1 = (xmax - self.x0) / self.vx
+        elif xmin <= self.x0 <= xmax:
+            tx0, tx1 = 0.0, math.inf
+        else:
+            return None
+
+        for t0, t1 in self.windowsY(ymin, ymax):
+            t0 = max(t0, tx0)
+            t1 = min(t1, tx1)
+            if t0 > t1:
+                continue
+            tick = max(first, math.floor(t0 * TICKS_PER_SECOND) - 1)
+            end = t1 * TICKS_PER_SECOND + 1
+            if last is not None:
+                end = min(end, last)
+            while tick <= end:
+                if intersects(self.shotRect(tick, height), rect):
+                    return tick
+                tick += 1
+        return None
+
+    def solveY(self, y):
+        """Return the sorted times, in seconds, when the height is ``y``."""
+        a = -0.5 * self.gravity
+        b = self.vy
+        c = self.y0 - y
+        if a == 0:
+            return [-c / b] if b else []
+        delta = b*b - 4*a*c
+        if delta < 0:
+            return []
+        root = math.sqrt(delta)
+        return sorted(((-b - root) / (2*a), (-b + root) / (2*a)))
+
+    def windowsY(self, ymin, ymax):
+        """Return the time intervals when the height is within the range."""
+        if self.gravity <= 0:
+            # Without gravity the height is linear in time.
+            if self.vy == 0:
+                return [(0.0, math.inf)] if ymin <= self.y0 <= ymax else []
+            t0, t1 = sorted(((ymin - self.y0) / self.vy,
+                (ymax - self.y0) / self.vy))
+            return [(max(0.0, t0), t1)] if t1 >= 0 else []
+
+        below = self.solveY(ymin)
+        if not below:
+            return []
+        above = self.solveY(ymax)
+        if not above:
+            # The apex is below ymax: one window between the ymin crossings.
+            windows = [(below[0], below[1])]
+        else:
+            windows = [(below[0], above[0]), (above[1], below[1])]
+        return [(max(0.0, t0), t1) for t0, t1 in windows if t1 >= 0]
+
+    def firstTick(self, predicate, guess):
+        """Return the first tick from 1 on where ``predicate`` holds.
+
+        ``predicate`` must hold from some tick on, ``guess`` being close.
+        """
+        tick = max(1, math.ceil(guess))
+        while tick > 1 and predicate(tick - 1):
+            tick -= 1
+        while not predicate(tick):
+            tick += 1
+        return tick
+
+    def impact(self, width, height, target, obstacles=()):
+        """Return ``(tick, isHit)``, where and how the shot ends.
+
+        The shot hits ``target`` unless it leaves the widget or meets one of
+        the ``obstacles`` first; a target met on the same tick as an
+        obstacle counts as a hit, as in ``CannonField.moveShot()``.
+        """
+        end = self.exitTick(width, height)
+        for obstacle in obstacles:
+            tick = self.hitTick(obstacle, height, last=end)
+            if tick is not None:
+                end = tick
+        if target is not None:
+            tick = self.hitTick(target, height, last=end)
+            if tick is not None:
+                return tick, True
+        return end, False
+
+
+def intersects(a, b):
+    """Tell whether two inclusive rectangles overlap, like QRect does."""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
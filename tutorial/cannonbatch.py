@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Cannon batch ballistics
+
+*Salvo* flies any number of *CannonField* shots at once. The launch
+parameters of the shots and their tick counters are kept in NumPy arrays, so
+advancing, testing and culling hundreds of shots is a handful of vectorized
+operations per frame rather than a Python loop over *Trajectory* objects.
+
+*HitMap* solves the whole grid of angles and forces the *GameBoard* sliders
+allow at once: it records the flight of every (angle, force) shot in a field
+of a given size, so that the pairs hitting any target are then found with a
+single vectorized test. ``hitMap()`` caches the maps per field size.
+
+The positions follow *Trajectory* exactly, rounding included: ``np.rint``
+rounds halves to even like Python's ``round()``, and the shot rectangles are
+the same inclusive ``(left, top, right, bottom)`` widget rectangles.
+"""
+import functools
+
+import numpy as np
+
+from ballistics import SHOT_SIZE, TICKS_PER_SECOND
+
+# The ranges of the angle and force sliders of the GameBoard.
+ANGLES = tuple(range(5, 86))
+FORCES = tuple(range(10, 51))
+HIT_MAP_CACHE_SIZE = 8
+
+
+class Salvo:
+    """Shots in flight, each with its own angle, force and age in ticks."""
+
+    def __init__(self, gravity, muzzle):
+        self.gravity = gravity
+        self.muzzle = muzzle
+        self.vx = np.zeros(0)
+        self.vy = np.zeros(0)
+        self.x0 = np.zeros(0)
+        self.y0 = np.zeros(0)
+        self.ticks = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def fire(self, angles, forces):
+        """Launch one shot per angle, in degrees, and force."""
+        radians = np.radians(np.asarray(angles, dtype=float))
+        forces = np.asarray(forces, dtype=float)
+        self.vx = np.concatenate((self.vx, forces * np.cos(radians)))
+        self.vy = np.concatenate((self.vy, forces * np.sin(radians)))
+        self.x0 = np.concatenate((self.x0, self.muzzle * np.cos(radians)))
+        self.y0 = np.concatenate((self.y0, self.muzzle * np.sin(radians)))
+        self.ticks = np.concatenate(
+            (self.ticks, np.zeros(len(radians), dtype=np.int64)))
+
+    def advance(self, ticks=1):
+        self.ticks += ticks
+
+    def centers(self, height, ago=0):
+        """Return the widget pixels the shot rectangles are centred on.
+
+        With ``ago``, the shots are where they were that many ticks earlier,
+        or at the muzzle for the younger ones.
+        """
+        t = np.maximum(self.ticks - ago, 0) / TICKS_PER_SECOND
+        x = self.x0 + self.vx*t
+        y = self.y0 + self.vy*t - 0.5*self.gravity*t*t
+        return (np.rint(x).astype(np.int64),
+            height - 1 - np.rint(y).astype(np.int64))
+
+    def shotRects(self, height, ago=0):
+        """Return the ``left`` and ``top`` arrays of the shot rectangles."""
+        x, y = self.centers(height, ago)
+        half = (SHOT_SIZE - 1) // 2
+        return x - half, y - half
+
+    def meets(self, rect, height):
+        """Return the mask of the shots overlapping the inclusive ``rect``."""
+        left, top, right, bottom = rect
+        x, y = self.shotRects(height)
+        return ((x <= right) & (left <= x + SHOT_SIZE - 1) &
+            (y <= bottom) & (top <= y + SHOT_SIZE - 1))
+
+    def outside(self, width, height):
+        """Return the mask of the shots out of the widget."""
+        x, y = self.shotRects(height)
+        return (x > width) | (y > height)
+
+    def remove(self, mask):
+        keep = ~mask
+        self.vx = self.vx[keep]
+        self.vy = self.vy[keep]
+        self.x0 = self.x0[keep]
+        self.y0 = self.y0[keep]
+        self.ticks = self.ticks[keep]
+
+    def step(self, width, height, target, obstacles=()):
+        """Advance the shots by one tick and end those that hit something.
+
+        Returns the number of shots that hit ``target``. Shots that meet one
+        of the ``obstacles`` or leave the widget are culled; as with
+        ``Trajectory.impact()``, meeting the target wins on the same tick.
+        """
+        self.advance()
+        ended = self.outside(width, height)
+        for obstacle in obstacles:
+            ended |= self.meets(obstacle, height)
+        hits = 0
+        if target is not None:
+            hit = self.meets(target, height)
+            hits = int(hit.sum())
+            ended |= hit
+        if ended.any():
+            self.remove(ended)
+        return hits
+
+
+class HitMap:
+    """The flights of the shots of an angle and force grid in a field.
+
+    ``gravity`` and ``muzzle`` are those of the *CannonField*. Every shot
+    flies from tick 1 until it leaves the ``width`` x ``height`` field or
+    meets one of the ``obstacles``, the tick it ends on included.
+    """
+    PARKED = -10000
+
+    def __init__(self, width, height, gravity, muzzle, obstacles=(),
+            angles=ANGLES, forces=FORCES):
+        self.width = width
+        self.height = height
+        self.angles = np.asarray(angles)
+        self.forces = np.asarray(forces)
+        grid = np.meshgrid(self.angles, self.forces, indexing="ij")
+        salvo = Salvo(gravity, muzzle)
+        salvo.fire(grid[0].ravel(), grid[1].ravel())
+
+        # One column per tick of the shot rectangles. The shots that ended
+        # are parked far off the field, where they meet nothing.
+        flying = np.arange(len(salvo))
+        lefts = []
+        tops = []
+        while len(salvo):
+            salvo.advance()
+            x, y = salvo.shotRects(height)
+            left = np.full(self.size(), HitMap.PARKED, dtype=np.int16)
+            top = np.full(self.size(), HitMap.PARKED, dtype=np.int16)
+            left[flying] = x
+            top[flying] = y
+            lefts.append(left)
+            tops.append(top)
+
+            ended = (x > width) | (y > height)
+            for obstacle in obstacles:
+                ended |= salvo.meets(obstacle, height)
+            salvo.remove(ended)
+            flying = flying[~ended]
+        self.left = np.stack(lefts, axis=1)
+        self.top = np.stack(tops, axis=1)
+        # The range of the shots at every tick, to skip the ticks when none
+        # of them can meet a target.
+        parked = self.left == HitMap.PARKED
+        self.minLeft = np.where(parked, np.iinfo(np.int16).max, self.left).min(
+            axis=0)
+        self.maxLeft = self.left.max(axis=0)
+
+    def size(self):
+        return len(self.angles) * len(self.forces)
+
+    def hits(self, target):
+        """Return the ``(angles, forces)`` mask of the shots hitting target.
+
+        ``target`` is an inclusive ``(left, top, right, bottom)`` rectangle.
+        """
+        left, top, right, bottom = target
+        ticks = np.flatnonzero((self.minLeft <= right) &
+            (left <= self.maxLeft + SHOT_SIZE - 1))
+        shotLeft = self.left[:, ticks]
+        shotTop = self.top[:, ticks]
+        meets = ((shotLeft <= right) & (left <= shotLeft + SHOT_SIZE - 1) &
+            (shotTop <= bottom) & (top <= shotTop + SHOT_SIZE - 1))
+        return meets.any(axis=1).reshape(len(self.angles), len(self.forces))
+
+    def hitsMany(self, targets):
+        """Return the ``(targets, angles, forces)`` masks of ``hits()``."""
+        return np.stack([self.hits(target) for target in targets])
+
+    def solutions(self, target):
+        """Return the ``(angle, force)`` pairs hitting ``target``."""
+        a, f = np.nonzero(self.hits(target))
+        return list(zip(self.angles[a].tolist(), self.forces[f].tolist()))
+
+
+@functools.lru_cache(maxsize=HIT_MAP_CACHE_SIZE)
+def hitMap(width, height, gravity, muzzle, obstacles=()):
+    """Return the *HitMap* of the slider grid, cached per field.
+
+    The arguments must be hashable: ``obstacles`` is a tuple of rectangles.
+    """
+    return HitMap(width, height, gravity, muzzle, obstacles)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Cannon game score
+
+*ScoreModel* holds the hits and the shots left of a game of tutorial 14, so
+that *GameBoard* applies its rules to plain attributes rather than reading
+them back from its ``QLCDNumber`` displays. The displays are bound to the
+model as listeners.
+
+The model is Qt-free. Every change marks it dirty, and the listeners are
+called once for all the changes made until the ``defer`` callable runs the
+notification: *GameBoard* defers with ``QTimer.singleShot(0, ...)``, which
+gives one display update per turn of the event loop. Without ``defer`` the
+listeners are called right away, as tests and benchmarks want.
+"""
+
+GAME_SHOTS = 15
+
+
+class ScoreModel:
+    """The hits and shots left of a cannon game."""
+
+    def __init__(self, defer=None):
+        self.hits = 0
+        self.shotsLeft = 0
+        self.defer = defer
+        self.listeners = []
+        self.pending = False
+
+    def subscribe(self, listener):
+        """Call ``listener(model)`` after the changes of the model."""
+        self.listeners.append(listener)
+
+    def newGame(self):
+        self.hits = 0
+        self.shotsLeft = GAME_SHOTS
+        self.changed()
+
+    def fire(self):
+        self.shotsLeft -= 1
+        self.changed()
+
+    def hit(self):
+        self.hits += 1
+        self.changed()
+
+    def isLastShot(self):
+        return self.shotsLeft == 0
+
+    def changed(self):
+        if self.defer is None:
+            self.notify()
+        elif not self.pending:
+            self.pending = True
+            self.defer(self.notify)
+
+    def notify(self):
+        self.pending = False
+        for listener in self.listeners:
+            listener(self)
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""Cannon game simulator
+
+Monte Carlo simulation of the game of tutorial 14, without Qt. The rules are
+those of *GameBoard* and *CannonField*: a game has 15 shots, a hit scores
+and brings up a new target, placed at random like ``newTarget()`` does, and
+after a miss the target stays where it is. The barrier stands between the
+cannon and the targets.
+
+A shot only depends on its angle and force, which the sliders keep to whole
+numbers, and on where the target is, so every outcome is computed once: a
+*ShotTable* takes the flights of a *HitMap* of the grid and rasterizes them
+into the set of target positions that each shot hits. Games are then played
+N at a time with NumPy, one lookup per shot, and batches of games fan out
+across a ``ProcessPoolExecutor``::
+
+    python cannonsim.py --games 1000000 --strategy random --strategy aimed
+    python cannonsim.py --barrier 200 --max-force 40 --spread 2
+
+The table of every field configuration is built once per process, in a
+fraction of a second, so that the difficulty can be tuned in seconds.
+"""
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ballistics import SHOT_SIZE
+from cannonbatch import ANGLES, FORCES, HitMap
+from cannonscore import GAME_SHOTS
+
+FIELD_WIDTH = 400
+FIELD_HEIGHT = 300
+GRAVITY = 9.8
+MUZZLE = 52
+BARRIER_X = 145
+BARRIER_SIZE = (15, 99)
+TARGET_SIZE = (20, 10)
+# The target centres newTarget() picks from, in the cannon frame.
+TARGET_X = (200, 389)
+TARGET_Y = (10, 264)
+BATCH_SIZE = 100000
+
+
+class ShotTable:
+    """Which targets every (angle, force) shot of the grid hits.
+
+    ``barrier`` is the left side of the barrier, or None for none.
+    """
+
+    def __init__(self, width=FIELD_WIDTH, height=FIELD_HEIGHT,
+            gravity=GRAVITY, muzzle=MUZZLE, barrier=BARRIER_X,
+            angles=ANGLES, forces=FORCES):
+        self.width = width
+        self.height = height
+        obstacles = ()
+        if barrier is not None:
+            obstacles = (self.barrierRect(barrier),)
+        hitMap = HitMap(width, height, gravity, muzzle, obstacles, angles,
+            forces)
+        self.angleValues = hitMap.angles
+        self.forceValues = hitMap.forces
+        # Grid indices of the angle and force values, looked up directly.
+        self.angleIndex = np.zeros(self.angleValues.max() + 1, dtype=np.int64)
+        self.angleIndex[self.angleValues] = np.arange(len(self.angleValues))
+        self.forceIndex = np.zeros(self.forceValues.max() + 1, dtype=np.int64)
+        self.forceIndex[self.forceValues] = np.arange(len(self.forceValues))
+        grid = np.meshgrid(hitMap.angles, hitMap.forces, indexing="ij")
+        self.angles = grid[0].ravel()
+        self.forces = grid[1].ravel()
+        self.hits = self.rasterize(hitMap)
+        # The shots hitting at least one target.
+        self.useful = np.flatnonzero(self.hits.any(axis=(1, 2)))
+        self.aims = self.centralAims()
+
+    def barrierRect(self, left):
+        """Return the barrier as an inclusive rectangle."""
+        width, height = BARRIER_SIZE
+        top = self.height - 100
+        return left, top, left + width - 1, top + height - 1
+
+    def numTargets(self):
+        return TARGET_X[1] - TARGET_X[0] + 1, TARGET_Y[1] - TARGET_Y[0] + 1
+
+    def rasterize(self, hitMap, chunk=64):
+        """Return the packed ``(shots, x, y)`` bits of the targets hit.
+
+        A target centre is hit when the target rectangle overlaps the shot
+        at some tick of its flight: the centres around a shot rectangle make
+        a box, and the boxes of all the ticks are summed up with 2D
+        difference arrays.
+        """
+        nx, ny = self.numTargets()
+        width, height = TARGET_SIZE
+        # QRect.moveCenter() extents of the target around its centre.
+        left = (width - 1) // 2
+        top = (height - 1) // 2
+        numShots = len(self.angles)
+        packed = np.zeros((numShots, nx, (ny + 7) // 8), dtype=np.uint8)
+        for start in range(0, numShots, chunk):
+            stop = min(start + chunk, numShots)
+            shotLeft = hitMap.left[start:stop].astype(np.int64)
+            shotTop = hitMap.top[start:stop].astype(np.int64)
+            shot, tick = np.nonzero(shotLeft != HitMap.PARKED)
+            shotLeft = shotLeft[shot, tick]
+            shotTop = shotTop[shot, tick]
+
+            # Box of the target centres, as indices into the target grid;
+            # the y axis of the widget runs down, the cannon frame one up.
+            x0 = shotLeft - (width - 1 - left) - TARGET_X[0]
+            x1 = shotLeft + SHOT_SIZE - 1 + left - TARGET_X[0]
+            y0 = (self.height - 1 - (shotTop + SHOT_SIZE - 1 + top) -
+                TARGET_Y[0])
+            y1 = (self.height - 1 - (shotTop - (height - 1 - top)) -
+                TARGET_Y[0])
+            inside = (x1 >= 0) & (x0 < nx) & (y1 >= 0) & (y0 < ny)
+            if not inside.any():
+                continue
+            # Most shots never get near the targets: only the others are
+            # summed up.
+            rows, shot = np.unique(shot[inside], return_inverse=True)
+            x0 = x0[inside].clip(0, nx)
+            x1 = x1[inside].clip(-1, nx - 1) + 1
+            y0 = y0[inside].clip(0, ny)
+            y1 = y1[inside].clip(-1, ny - 1) + 1
+
+            diff = np.zeros((len(rows), nx + 1, ny + 1), dtype=np.int32)
+            np.add.at(diff, (shot, x0, y0), 1)
+            np.add.at(diff, (shot, x1, y0), -1)
+            np.add.at(diff, (shot, x0, y1), -1)
+            np.add.at(diff, (shot, x1, y1), 1)
+            counts = diff.cumsum(axis=1).cumsum(axis=2)[:, :nx, :ny]
+            packed[start + rows] = np.packbits(counts > 0, axis=2)
+        return packed
+
+    def hit(self, shots, x, y):
+        """Tell whether ``shots`` hit the targets centred on ``(x, y)``.
+
+        ``x`` and ``y`` are indices into the target grid, all arrays.
+        """
+        bits = self.hits[shots, x, y >> 3]
+        return ((bits >> (7 - (y & 7))) & 1).astype(bool)
+
+    def centralAims(self, chunk=64):
+        """Return, for every target, the hitting shot most inside the set.
+
+        That is the hitting shot closest to the mean angle and force of all
+        the hitting shots, or -1 for the targets no shot hits.
+        """
+        nx, ny = self.numTargets()
+        chunks = [self.useful[start:start+chunk]
+            for start in range(0, len(self.useful), chunk)]
+        count = np.zeros((nx, ny), dtype=np.float32)
+        sumAngles = np.zeros((nx, ny), dtype=np.float32)
+        sumForces = np.zeros((nx, ny), dtype=np.float32)
+        for shots in chunks:
+            hits = self.unpack(shots).astype(np.float32)
+            count += hits.sum(axis=0)
+            sumAngles += np.tensordot(self.angles[shots], hits, 1)
+            sumForces += np.tensordot(self.forces[shots], hits, 1)
+        count = np.maximum(count, 1)
+        meanAngle = sumAngles / count
+        meanForce = sumForces / count
+
+        aims = np.full((nx, ny), -1, dtype=np.int64)
+        best = np.full((nx, ny), np.inf, dtype=np.float32)
+        for shots in chunks:
+            hits = self.unpack(shots).astype(bool)
+            angles = self.angles[shots, None, None]
+            forces = self.forces[shots, None, None]
+            distance = np.where(hits,
+                (angles - meanAngle)**2 + (forces - meanForce)**2, np.inf)
+            closest = distance.argmin(axis=0)
+            nearest = np.take_along_axis(distance, closest[None], 0)[0]
+            better = nearest < best
+            aims[better] = shots[closest[better]]
+            best[better] = nearest[better]
+        return aims
+
+    def unpack(self, shots):
+        """Return the ``(shots, x, y)`` hits of the given shots, as 0/1."""
+        ny = self.numTargets()[1]
+        return np.unpackbits(self.hits[shots], axis=2, count=ny)
+
+    def shotIndex(self, angles, forces):
+        """Return the grid shots of the given angles and forces.
+
+        The values must be integers within the ranges of the grid.
+        """
+        return (self.angleIndex[angles] * len(self.forceValues) +
+            self.forceIndex[forces])
+
+
+def randomStrategy(table, x, y, rng, spread):
+    """Fire anywhere on the grid, whatever the target."""
+    return rng.integers(0, len(table.angles), len(x))
+
+
+def aimedStrategy(table, x, y, rng, spread):
+    """Aim with the central hitting shot, give or take ``spread``.
+
+    The angle and force are off by a normal error of deviation ``spread``
+    slider steps; unreachable targets get random shots.
+    """
+    aims = table.aims[x, y]
+    reachable = aims >= 0
+    shots = np.where(reachable, aims,
+        rng.integers(0, len(table.angles), len(x)))
+    if spread > 0:
+        error = np.rint(rng.normal(0, spread, (2, len(x)))).astype(np.int64)
+        angles = table.angles[shots] + error[0]
+        forces = table.forces[shots] + error[1]
+        angles = angles.clip(table.angleValues[0], table.angleValues[-1])
+        forces = forces.clip(table.forceValues[0], table.forceValues[-1])
+        shots = np.where(reachable, table.shotIndex(angles, forces), shots)
+    return shots
+
+
+STRATEGIES = {
+    "random": randomStrategy,
+    "aimed": aimedStrategy,
+}
+
+
+@functools.lru_cache(maxsize=4)
+def shotTable(width, height, gravity, muzzle, barrier, forces):
+    """Return the *ShotTable* of a field, built once per process."""
+    return ShotTable(width, height, gravity, muzzle, barrier, ANGLES, forces)
+
+
+def randomTargets(rng, count):
+    nx = TARGET_X[1] - TARGET_X[0] + 1
+    ny = TARGET_Y[1] - TARGET_Y[0] + 1
+    return rng.integers(0, nx, count), rng.integers(0, ny, count)
+
+
+def playGames(table, numGames, strategy, spread=0.0, rng=None):
+    """Play ``numGames`` games; return the number of hits of each one."""
+    if rng is None:
+        rng = np.random.default_rng()
+    choose = STRATEGIES[strategy]
+    hits = np.zeros(numGames, dtype=np.int64)
+    x, y = randomTargets(rng, numGames)
+    for _ in range(GAME_SHOTS):
+        hit = table.hit(choose(table, x, y, rng, spread), x, y)
+        hits += hit
+        # A hit brings up a new target, a miss leaves it where it is.
+        newX, newY = randomTargets(rng, int(hit.sum()))
+        x[hit] = newX
+        y[hit] = newY
+    return hits
+
+
+def playBatch(field, numGames, strategy, spread, seed):
+    """Return the histogram of the hits per game of one batch of games."""
+    table = shotTable(*field)
+    hits = playGames(table, numGames, strategy, spread,
+        np.random.default_rng(seed))
+    return np.bincount(hits, minlength=GAME_SHOTS + 1)
+
+
+def simulate(numGames, strategy, spread=0.0, field=None, workers=0,
+        seed=None, batchSize=BATCH_SIZE):
+    """Return the histogram of the hits per game over ``numGames`` games.
+
+    ``field`` is the ``(width, height, gravity, muzzle, barrier, forces)``
+    of ``shotTable()``, the game of tutorial 14 by default. With
+    ``workers``, the batches of games are played across that many
+    processes.
+    """
+    if field is None:
+        field = (FIELD_WIDTH, FIELD_HEIGHT, GRAVITY, MUZZLE, BARRIER_X,
+            FORCES)
+    sizes = [min(batchSize, numGames - start)
+        for start in range(0, numGames, batchSize)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    histogram = np.zeros(GAME_SHOTS + 1, dtype=np.int64)
+    if workers:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = [executor.submit(
+                playBatch, field, size, strategy, spread, batchSeed)
+                for size, batchSeed in zip(sizes, seeds)]
+            for future in futures:
+                histogram += future.result()
+    else:
+        for size, batchSeed in zip(sizes, seeds):
+            histogram += playBatch(field, size, strategy, spread, batchSeed)
+    return histogram
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Cannon game simulator")
+    parser.add_argument("--games", type=int, default=100000,
+        help="number of games per strategy (default: 100000)")
+    parser.add_argument("--strategy", action="append",
+        choices=sorted(STRATEGIES),
+        help="strategy to play, can be repeated (default: all)")
+    parser.add_argument("--spread", type=float, default=1.0,
+        help="aiming error of the aimed strategy, in slider steps "
+            "(default: 1)")
+    parser.add_argument("--size", metavar="WxH",
+        default=f"{FIELD_WIDTH}x{FIELD_HEIGHT}",
+        help=f"field size (default: {FIELD_WIDTH}x{FIELD_HEIGHT})")
+    parser.add_argument("--barrier", type=int, default=BARRIER_X,
+        help=f"left side of the barrier, -1 for none (default: {BARRIER_X})")
+    parser.add_argument("--min-force", type=int, default=FORCES[0])
+    parser.add_argument("--max-force", type=int, default=FORCES[-1])
+    parser.add_argument("--workers", type=int, default=0,
+        help="processes playing the games (default: 0, in process)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    if args.min_force < 1:
+        parser.error("--min-force must be at least 1")
+    if args.min_force > args.max_force:
+        parser.error("--min-force must not exceed --max-force")
+
+    width, height = (int(n) for n in args.size.lower().split("x"))
+    field = (width, height, GRAVITY, MUZZLE,
+        None if args.barrier < 0 else args.barrier,
+        tuple(range(args.min_force, args.max_force + 1)))
+    for strategy in args.strategy or sorted(STRATEGIES):
+        t0 = time.perf_counter()
+        histogram = simulate(args.games, strategy, args.spread, field,
+            args.workers, args.seed)
+        elapsed = time.perf_counter() - t0
+        hits = np.arange(GAME_SHOTS + 1)
+        mean = (histogram * hits).sum() / args.games
+        print(f"{strategy}: {mean:.2f} hits per game, hit rate "
+            f"{mean / GAME_SHOTS:.1%}, in {elapsed:.2f} s")
+        print("  hits  " + " ".join(f"{n:>5}" for n in hits))
+        print("  games " + " ".join(
+            f"{n / args.games:>5.1%}" for n in histogram))
@@ -18,17 +18,31 @@ clockwise by 90 degrees.
 
 To avoid waiting for a piece to fall to the bottom of the board, press D to
 immediately move the piece down by one row, or press the SPACE key to drop
-it as close to the bottom of the board as possible.
+it as close to the bottom of the board as possible. Press A to let the
+*TetrixAI* autoplayer of the ``tetrixai`` module play in your place.
+
+Run with ``--size 100x400`` for a large well, e.g. for stress tests. It is
+shown in a scroll area, and only the rows on screen are painted.
+
+The pieces come from shuffled bags of all seven shapes; ``--preview N``
+shows the next N of them, up to 5.
+
+Run with ``--profile FILE`` to overlay the frame rate, the paint times and
+the frame timer jitter on the board, and to dump the timings collected by
+``tetrixstats`` as JSON into FILE on exit.
 
 This example example shows how a simple game can be created using only three
 classes.
 
 - The *TetrixWindow* class is used to display the payer's score, number of
 lives, and information about the next piece to appear.
-- The *TetrixBoard* class contains the next game logic, handles keyboard input,
+- The *TetrixBoard* class drives the game logic, handles keyboard input,
 and displays the pieces on the playing area.
 - The *TetrixPiece* class contains information about each piece.
 
+The game rules themselves live in the Qt-free *TetrixGame* class of the
+``tetrixcore`` module, so that they can also run headless.
+
 In this approach, the *TetrixBoard* clss is the most complex class, since it 
 handle the game logic and rendering. One benefit of this is that the 
 *TetrixWindow* and *TeTrixPiece* class are very simple and contains only a 
@@ -38,39 +52,39 @@ Credit: Most of the code here is based on official PySide6 example of Tetrix
 code. 
 Note: This code is used for learning Qt6 Programming.
 """
+import math
 import random
-from enum import IntEnum, auto
-from unittest import result
+import time
 
 from PySide6 import QtCore
 from PySide6 import QtGui
 from PySide6 import QtWidgets
 
-
-class ShapeEnum(IntEnum):
-    NO_SHAPE = 0
-    Z_SHAPE = 1
-    S_SHAPE = 2
-    LINE_SHAPE = 3
-    T_SHAPE = 4
-    SQUARE_SHAPE = 5
-    L_SHAPE = 6
-    MIRRORED_L_SHAPE = 7
+from tetrixai import TetrixAI
+from tetrixcore import (ActionEnum, GravityClock, ShapeEnum, TetrixGame,
+    TetrixPiece)
+from tetrixreplay import TetrixRecorder
 
 
 class TetrixWindow(QtWidgets.QWidget):
     """TetrixWindow."""
 
-    def __init__(self, root):
+    def __init__(self, root, width=TetrixGame.BOARD_WIDTH,
+        height=TetrixGame.BOARD_HEIGHT, previewSize=1):
         super(TetrixWindow, self).__init__()
 
-        self.board = TetrixBoard()
+        self.board = TetrixBoard(width=width, height=height)
 
-        nxtPieceLabel = QtWidgets.QLabel()
-        nxtPieceLabel.setFrameStyle(
-            QtWidgets.QFrame.Box | QtWidgets.QFrame.Raised)
-        nxtPieceLabel.setAlignment(QtCore.Qt.AlignCenter)
-        self.board.setNextPieceLabel(nxtPieceLabel)
+        previewLayout = QtWidgets.QVBoxLayout()
+        previewLabels = []
+        for _ in range(previewSize):
+            nxtPieceLabel = QtWidgets.QLabel()
+            nxtPieceLabel.setFrameStyle(
+                QtWidgets.QFrame.Box | QtWidgets.QFrame.Raised)
+            nxtPieceLabel.setAlignment(QtCore.Qt.AlignCenter)
+            previewLayout.addWidget(nxtPieceLabel)
+            previewLabels.append(nxtPieceLabel)
+        self.board.setPreviewLabels(previewLabels)
 
         scoreLcd = QtWidgets.QLCDNumber(5)
         scoreLcd.setSegmentStyle(QtWidgets.QLCDNumber.Filled)
@@ -95,11 +109,17 @@ class TetrixWindow(QtWidgets.QWidget):
 
         layout = QtWidgets.QGridLayout()
         layout.addWidget(self.createLabel("NEXT"), 0, 0)
-        layout.addWidget(nxtPieceLabel, 1, 0)
+        layout.addLayout(previewLayout, 1, 0)
         layout.addWidget(self.createLabel("LEVEL"), 2, 0)
         layout.addWidget(levelLcd, 3, 0)
         layout.addWidget(startBtn, 4, 0)
-        layout.addWidget(self.board, 0, 1, 6, 1)
+        if self.board.isLarge():
+            scrollArea = QtWidgets.QScrollArea()
+            scrollArea.setWidgetResizable(True)
+            scrollArea.setWidget(self.board)
+            layout.addWidget(scrollArea, 0, 1, 6, 1)
+        else:
+            layout.addWidget(self.board, 0, 1, 6, 1)
         layout.addWidget(self.createLabel("SCORE"), 0, 2)
         layout.addWidget(scoreLcd, 1, 2)
         layout.addWidget(self.createLabel("LINES REMOVED"), 2, 2)
@@ -119,388 +139,647 @@ class TetrixWindow(QtWidgets.QWidget):
 
 class TetrixBoard(QtWidgets.QFrame):
     """TetrixBoard."""
-    BOARD_WIDTH = 10
-    BOARD_HEIGHT = 22
+    BOARD_WIDTH = TetrixGame.BOARD_WIDTH
+    BOARD_HEIGHT = TetrixGame.BOARD_HEIGHT
+
+    KEY_ACTIONS = {
+        QtCore.Qt.Key_Left: ActionEnum.MOVE_LEFT,
+        QtCore.Qt.Key_Right: ActionEnum.MOVE_RIGHT,
+        QtCore.Qt.Key_Down: ActionEnum.ROTATE_RIGHT,
+        QtCore.Qt.Key_Up: ActionEnum.ROTATE_LEFT,
+        QtCore.Qt.Key_Space: ActionEnum.DROP_DOWN,
+        QtCore.Qt.Key_D: ActionEnum.ONE_LINE_DOWN,
+    }
+
+    COLOR_TABLE = (
+        0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
+        0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00
+    )
+    ROW_TILES_SIZE = 256
+    LARGE_SQUARE_SIZE = 8
+    GHOST_OPACITY = 0.3
 
     scoreChanged = QtCore.Signal(int)
     levelChanged = QtCore.Signal(int)
     linesRemovedChanged = QtCore.Signal(int)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, width=BOARD_WIDTH, height=BOARD_HEIGHT):
         super(TetrixBoard, self).__init__(parent)
 
         self.timer = QtCore.QBasicTimer()
-        self.nxtPieceLabel = None
-        self.isWaitingAfterLine = False
-        self.curPiece = TetrixPiece()
-        self.nxtPiece = TetrixPiece()
-        self.curx = 0
-        self.cury = 0
-        self.numLinesRemoved = 0
-        self.numPiecesDropped = 0
-        self.score = 0
-        self.level = 0
-        self.board = None
+        self.frameInterval = 0
+        self.lastFrame = 0.0
+        self.stats = None
+        self.previewLabels = []
+        self.boardWidth = width
+        self.boardHeight = height
+        self.game = self.newGame()
+        self.clock = QtCore.QElapsedTimer()
+        self.gravity = GravityClock(self.game)
+        self.recordPath = None
+        self.recorder = None
+        self.replayTimer = QtCore.QTimer(self)
+        self.replayTimer.setSingleShot(True)
+        self.replayTimer.timeout.connect(self.replayStep)
+        self.replayRecording = None
+        self.replayIndex = 0
+        self.replaySpeed = 1.0
+        self.isReplaying = False
+        self.autoPlayer = None
+        self.tiles = {}
+        self.previews = {}
+        self.rowTiles = {}
+        self.wellPixmap = None
+        self.wellRect = QtCore.QRect()
 
         self.setFrameStyle(QtWidgets.QFrame.Panel | QtWidgets.QFrame.Sunken)
         self.setFocusPolicy(QtCore.Qt.StrongFocus)
-        self.isStarted = False
         self.isPaused = False
-        self.clearBoard()
-
-        self.nxtPiece.setRandomShape()
 
     def shapeAt(self, x, y):
-        return self.board[(y * TetrixBoard.BOARD_WIDTH) + x]
+        return self.game.shapeAt(x, y)
 
-    def setShapeAt(self, x, y, shape: ShapeEnum):
-        self.board[(y * TetrixBoard.BOARD_WIDTH) + x] = shape
-
-    def timeoutTime(self):
-        return 1000 / (1 + self.level)
+    def now(self):
+        """Return the monotonic game time in milliseconds."""
+        return self.clock.nsecsElapsed() / 1e6
 
     def squareWidth(self):
-        return self.contentsRect().width() / TetrixBoard.BOARD_WIDTH
+        return self.contentsRect().width() / self.boardWidth
 
     def squareHeight(self):
-        return self.contentsRect().height() / TetrixBoard.BOARD_HEIGHT
+        return self.contentsRect().height() / self.boardHeight
+
+    def isLarge(self):
+        """Tell whether the well is larger than the classic one."""
+        return (self.boardWidth*self.boardHeight >
+            TetrixBoard.BOARD_WIDTH*TetrixBoard.BOARD_HEIGHT)
+
+    def visibleArea(self):
+        """Return the part of the well on screen, e.g. in a scroll area."""
+        visible = self.visibleRegion().boundingRect()
+        if visible.isEmpty():
+            return self.contentsRect()
+        return self.contentsRect().intersected(visible)
 
     def setNextPieceLabel(self, label):
-        self.nxtPieceLabel = label
+        self.setPreviewLabels([label])
+
+    def setPreviewLabels(self, labels):
+        """Show the next ``len(labels)`` pieces, one in each label."""
+        self.previewLabels = list(labels)
+        if not self.game.isStarted:
+            self.game = self.newGame()
+        self.showNextPiece()
+
+    def newGame(self):
+        return TetrixGame(random.getrandbits(64), self.boardWidth,
+            self.boardHeight, bag=True,
+            previewSize=max(1, len(self.previewLabels)))
+
+    def setStats(self, stats):
+        """Collect the timings of the board into a *TetrixStats*, or None."""
+        self.stats = stats
+        if stats is not None:
+            stats.instrument(self.game, "removeFullLines", "tryMove")
+        self.update()
+
+    def setRecordPath(self, path):
+        """Record the games played from now on into the file at ``path``."""
+        self.recordPath = path
 
     def sizeHint(self):
-        return QtCore.QSize(TetrixBoard.BOARD_WIDTH * 15 + self.frameWidth()*2,
-            TetrixBoard.BOARD_HEIGHT*15 + self.frameWidth()*2)
+        if self.isLarge():
+            return self.minimumSizeHint()
+        return QtCore.QSize(self.boardWidth * 15 + self.frameWidth()*2,
+            self.boardHeight*15 + self.frameWidth()*2)
 
     def minimumSizeHint(self):
-        return QtCore.QSize(TetrixBoard.BOARD_WIDTH*15 + self.frameWidth()*2,
-            TetrixBoard.BOARD_WIDTH * 5 + self.frameWidth()*2)
+        # A large well does not fit on screen; it is shown at a small fixed
+        # square size in a scroll area instead.
+        if self.isLarge():
+            return QtCore.QSize(
+                self.boardWidth*TetrixBoard.LARGE_SQUARE_SIZE +
+                self.frameWidth()*2,
+                self.boardHeight*TetrixBoard.LARGE_SQUARE_SIZE +
+                self.frameWidth()*2)
+        return QtCore.QSize(self.boardWidth*15 + self.frameWidth()*2,
+            self.boardWidth * 5 + self.frameWidth()*2)
 
     def start(self):
         if self.isPaused:
             return
 
-        self.isStarted = True
-        self.isWaitingAfterLine = False
-        self.numLinesRemoved = 0
-        self.numPiecesDropped = 0
-        self.score = 0
-        self.level = 1
-        self.clearBoard()
+        self.stopReplay()
+        self.game = self.newGame()
+        if self.recordPath is not None:
+            self.recorder = TetrixRecorder(self.game)
+        self.startGame()
+        if self.game.isStarted:
+            self.startFrames()
+            self.scheduleAutoPlay()
+
+    def startFrames(self):
+        """Start the frame timer, paced to the refresh rate of the screen."""
+        screen = self.screen()
+        rate = screen.refreshRate() if screen is not None else 0
+        self.frameInterval = max(1, round(1000 / (rate if rate > 0 else 60)))
+        self.timer.start(self.frameInterval, QtCore.Qt.PreciseTimer, self)
+        self.lastFrame = time.perf_counter()
+        self.gravity.resume(self.now())
+
+    def frame(self):
+        """Apply the gravity ticks that fell due since the last frame.
+
+        The widget repaints once after the frame, whatever the number of
+        ticks applied.
+        """
+        for _ in self.gravity.ticks(self.now()):
+            self.step((ActionEnum.TICK,))
+            if not self.game.isStarted:
+                break
+
+    def startGame(self):
+        if self.stats is not None:
+            self.stats.instrument(self.game, "removeFullLines", "tryMove")
+        self.game.start()
+        self.clock.start()
+        self.gravity = GravityClock(self.game, self.now())
+
+        self.linesRemovedChanged.emit(self.game.numLinesRemoved)
+        self.scoreChanged.emit(self.game.score)
+        self.levelChanged.emit(self.game.level)
 
-        self.linesRemovedChanged.emit(self.numLinesRemoved)
-        self.scoreChanged.emit(self.score)
-        self.levelChanged.emit(self.level)
+        self.showNextPiece()
+        self.update()
 
-        self.newPiece()
-        self.timer.start(self.timeoutTime(), self)
+    def saveRecording(self):
+        if self.recorder is not None:
+            self.recorder.recording.save(self.recordPath)
+
+    def replay(self, recording, speed=1.0):
+        """Play ``recording`` back on the board, ``speed`` times faster."""
+        self.timer.stop()
+        self.isPaused = False
+        self.recorder = None
+        self.game = TetrixGame(
+            recording.seed, recording.width, recording.height, recording.bag,
+            max(1, len(self.previewLabels)))
+        if (recording.width, recording.height) != (
+            self.boardWidth, self.boardHeight):
+            self.boardWidth = recording.width
+            self.boardHeight = recording.height
+            self.wellPixmap = None
+            self.updateGeometry()
+        self.replayRecording = recording
+        self.replayIndex = 0
+        self.replaySpeed = speed
+        self.isReplaying = True
+        self.startGame()
+        self.scheduleReplay()
+
+    def stopReplay(self):
+        self.replayTimer.stop()
+        self.replayRecording = None
+        self.isReplaying = False
+
+    def scheduleReplay(self):
+        events = self.replayRecording.events
+        if self.replayIndex >= len(events):
+            self.stopReplay()
+            if self.game.isStarted:
+                # The recording was saved mid-game: the player takes over
+                # where it ends, gravity included.
+                self.startFrames()
+                self.scheduleAutoPlay()
+            return
+        delay = events[self.replayIndex][0]/self.replaySpeed - self.clock.elapsed()
+        self.replayTimer.start(max(0, int(delay)))
+
+    def replayStep(self):
+        # Every event that is due is applied in one step, so that fast
+        # playback repaints once per timeout rather than once per event.
+        events = self.replayRecording.events
+        elapsed = self.clock.elapsed() * self.replaySpeed
+        index = self.replayIndex
+        while index < len(events) and events[index][0] <= elapsed:
+            index += 1
+        self.step([action for _, action in events[self.replayIndex:index]])
+        self.replayIndex = index
+        self.scheduleReplay()
+
+    def toggleAutoPlay(self):
+        """Hand the game over to a *TetrixAI*, or take it back.
+
+        The AI plays on the GUI thread, and its lookahead grows with the width
+        of the well, so large wells are played without it.
+        """
+        if self.autoPlayer is None:
+            self.autoPlayer = TetrixAI(lookahead=not self.isLarge())
+            self.scheduleAutoPlay()
+        else:
+            self.autoPlayer = None
+
+    def scheduleAutoPlay(self):
+        # The autoplayer moves from the event loop, so that a whole game is
+        # not played recursively from within a single step.
+        if self.autoPlayer is not None:
+            QtCore.QTimer.singleShot(0, self.autoPlay)
+
+    def autoPlay(self):
+        game = self.game
+        if (self.autoPlayer is None or not game.isStarted or self.isPaused or
+            self.isReplaying or game.curPiece.shape() == ShapeEnum.NO_SHAPE):
+            return
+        self.step(self.autoPlayer.actions(game))
 
     def pause(self):
-        if not self.isStarted:
+        if not self.game.isStarted or self.isReplaying:
             return
 
         self.isPaused = not self.isPaused
         if self.isPaused:
             self.timer.stop()
         else:
-            self.timer.start(self.timeoutTime(), self)
+            self.startFrames()
+            self.scheduleAutoPlay()
 
         self.update()
 
     def paintEvent(self, event):
+        if self.stats is None:
+            self.paintBoard(event)
+            return
+
+        with self.stats.timed("paintEvent"):
+            self.paintBoard(event)
+        self.stats.frame()
+
+    def paintBoard(self, event):
         super(TetrixBoard, self).paintEvent(event)
 
         painter = QtGui.QPainter(self)
-        rect = self.contentsRect()
 
         if self.isPaused:
-            painter.drawText(rect, QtCore.Qt.AlignCenter, "Pause")
+            painter.drawText(
+                self.visibleArea(), QtCore.Qt.AlignCenter, "Pause")
             return
 
-        boardTop = rect.bottom() - TetrixBoard.BOARD_HEIGHT*self.squareHeight()
-        for i in range(TetrixBoard.BOARD_HEIGHT):
-            for j in range(TetrixBoard.BOARD_WIDTH):
-                shape = self.shapeAt(j, TetrixBoard.BOARD_HEIGHT-i-1)
-                if shape != ShapeEnum.NO_SHAPE:
-                    self.drawSquare(
-                        painter, rect().left() + j*self.squareWidth(),
-                        boardTop+i*self.squareHeight(), shape)
-
-        if self.curPiece.shape() != ShapeEnum.NO_SHAPE:
-            for i in range(4):
-                x = self.curx + self.curPiece.xcoord(i)
-                y = self.cury - self.curPiece.ycoord(i)
-                self.drawSquare(painter, rect.left() + x *self.squareWidth(),
-                    boardTop+(TetrixBoard.BOARD_HEIGHT-y-1)*self.squareHeight(),
-                    self.curPiece.shape())
+        # The settled blocks come from the well pixmap, which only covers the
+        # part of the well on screen; the pixmap is clipped to the exposed
+        # rectangle, and the pieces are drawn on top of it.
+        exposed = event.rect()
+        area = self.visibleArea()
+        if not area.contains(exposed):
+            area = area.united(exposed)
+        self.updateWellPixmap(self.game.board.takeDirty(), area)
+        painter.drawPixmap(self.wellRect.topLeft(), self.wellPixmap)
+
+        game = self.game
+        if game.curPiece.shape() != ShapeEnum.NO_SHAPE:
+            painter.setOpacity(TetrixBoard.GHOST_OPACITY)
+            self.drawPiece(painter, game.curPiece, game.curx, self.ghostY())
+            painter.setOpacity(1.0)
+            self.drawPiece(painter, game.curPiece, game.curx, game.cury)
+
+        if self.stats is not None:
+            self.drawOverlay(painter)
+
+    def resizeEvent(self, event):
+        self.tiles.clear()
+        self.previews.clear()
+        self.rowTiles.clear()
+        self.wellPixmap = None
+        super(TetrixBoard, self).resizeEvent(event)
+
+    def moveEvent(self, event):
+        # Scrolling moves the board under the overlay, which stays put.
+        if self.stats is not None:
+            self.update(self.overlayRect())
+        super(TetrixBoard, self).moveEvent(event)
 
     def keyPressEvent(self, event):
-        if (not self.isStarted or self.isPaused or
-            self.curPiece.shape() == ShapeEnum.NO_SHAPE):
-            super(TetrixBoard, self).keyPressEvent(event)
+        if event.key() == QtCore.Qt.Key_A:
+            self.toggleAutoPlay()
             return
 
-        key = event.key()
-        if key == QtCore.Qt.Key_Left:
-            self.tryMove(self.curPiece, self.curx-1, self.cury)
-        elif key == QtCore.Qt.Key_Right:
-            self.tryMove(self.curPiece, self.curx+1, self.cury)
-        elif key == QtCore.Qt.Key_Down:
-            self.tryMove(self.curPiece.rotatedRight(), self.curx, self.cury)
-        elif key == QtCore.Qt.Key_Up:
-            self.tryMove(self.curPiece.rotatedLeft(), self.curx, self.cury)
-        elif key == QtCore.Qt.Key_Space:
-            self.dropDown()
-        elif key == QtCore.Qt.Key_D:
-            self.oneLineDown()
-        else:
+        action = TetrixBoard.KEY_ACTIONS.get(event.key())
+        if (action is None or not self.game.isStarted or self.isPaused or
+            self.isReplaying or
+            self.game.curPiece.shape() == ShapeEnum.NO_SHAPE):
             super(TetrixBoard, self).keyPressEvent(event)
+            return
+
+        self.step((action,))
 
     def timerEvent(self, event):
-        if event.timerId() == self.timer.timerId():
-            if self.isWaitingAfterLine:
-                self.isWaitingAfterLine = False
-                self.newPiece()
-                self.timer.start(self.timeoutTime(), self)
-            else:
-                self.oneLineDown()
-        else:
+        if event.timerId() != self.timer.timerId():
             super(TetrixBoard, self).timerEvent(event)
-
-    def clearBoard(self):
-        self.board = [ShapeEnum.NO_SHAPE for i in 
-            range(TetrixBoard.BOARD_HEIGHT*TetrixBoard.BOARD_WIDTH)]
-
-    def dropDown(self):
-        dropHeight = 0
-        newy = self.cury
-        while newy:
-            if not self.tryMove(self.curPiece, self.cury, newy - 1):
-                break
-            newy -= 1
-            dropHeight += 1
-
-        self.pieceDropped(dropHeight)
-
-    def oneLineDown(self):
-        if not self.tryMove(self.curPiece, self.curx, self.cury-1):
-            self.pieceDropped(0)
-
-    def pieceDropped(self, dropHeight):
-        for i in range(4):
-            x = self.curx + self.curPiece.xcoord(i)
-            y = self.cury - self.curPiece.ycoord(i)
-            self.setShapeAt(x, y, self.curPiece.shape())
-
-        self.numPiecesDropped += 1
-        if self.numPiecesDropped % 25 == 0:
-            self.level += 1
-            self.timer.start(self.timeoutTime(), self)
-            self.levelChanged.emit(self.level)
-
-        self.score += dropHeight + 7
-        self.scoreChanged.emit(self.score)
-        self.removeFullLines()
-
-    def removeFullLines(self):
-        numFullLines = 0
-        for i in range(TetrixBoard.BOARD_HEIGHT -1, -1, -1):
-            lineIsFull = True
-            for j in range(TetrixBoard.BOARD_WIDTH):
-                if self.shapeAt(j, i) == ShapeEnum.NO_SHAPE:
-                    lineIsFull = False
-                    break
-            
-            if lineIsFull:
-                numFullLines += 1
-                for k in range(TetrixBoard.BOARD_HEIGHT-1):
-                    for j in range(TetrixBoard.BOARD_WIDTH):
-                        self.setShapeAt(j, k, self.shapeAt(j, k+1))
-
-                for j in range(TetrixBoard.BOARD_WIDTH):
-                    self.setShapeAt(j, TetrixBoard.BOARD_HEIGHT-1,
-                        ShapeEnum.NO_SHAPE)
-        if numFullLines > 0:
-            self.numLinesRemoved += numFullLines
-            self.score += 10 * numFullLines
-            self.linesRemovedChanged.emit(self.numLinesRemoved)
-            self.scoreChanged.emit(self.score)
-
-            self.timer.start(500, self)
-            self.isWaitingAfterLine = True
-            self.curPiece.setShape(ShapeEnum.NO_SHAPE)
-            self.update()
-
-    def newPiece(self):
-        self.curPiece = self.nxtPiece
-        self.nxtPiece.setRandomShape()
-        self.showNextPiece()
-        self.curx = (TetrixBoard.BOARD_WIDTH // 2) + 1
-        self.cury = TetrixBoard.BOARD_HEIGHT - 1 + self.curPiece.ymin()
-
-        if not self.tryMove(self.curPiece, self.curx, self.cury):
-            self.curPiece.setShape(ShapeEnum.NO_SHAPE)
+        elif self.stats is None:
+            self.frame()
+        else:
+            now = time.perf_counter()
+            self.stats.record("jitter",
+                abs((now - self.lastFrame)*1000 - self.frameInterval))
+            self.lastFrame = now
+            with self.stats.timed("timerEvent"):
+                self.frame()
+
+    def step(self, actions):
+        """Feed ``actions`` to the game and bring the widget up to date."""
+        game = self.game
+        curPiece = game.curPiece
+        curx = game.curx
+        cury = game.cury
+        ghosty = self.ghostY()
+        score = game.score
+        level = game.level
+        numLinesRemoved = game.numLinesRemoved
+        numPiecesDropped = game.numPiecesDropped
+        isWaitingAfterLine = game.isWaitingAfterLine
+
+        if self.recorder is not None:
+            self.recorder.step(actions, self.clock.elapsed())
+        else:
+            game.step(actions)
+
+        if game.numLinesRemoved != numLinesRemoved:
+            self.linesRemovedChanged.emit(game.numLinesRemoved)
+        if game.score != score:
+            self.scoreChanged.emit(game.score)
+        if game.level != level:
+            self.levelChanged.emit(game.level)
+
+        if self.isReplaying:
+            pass
+        elif not game.isStarted:
             self.timer.stop()
-            self.isStarted = False
+            self.saveRecording()
+        elif game.isWaitingAfterLine and not isWaitingAfterLine:
+            self.gravity.restart()
+
+        if game.numPiecesDropped != numPiecesDropped or isWaitingAfterLine:
+            self.showNextPiece()
+            if not self.isReplaying:
+                self.scheduleAutoPlay()
+
+        region = QtGui.QRegion()
+        if curPiece.shape() != ShapeEnum.NO_SHAPE:
+            region += self.pieceRect(curPiece, curx, cury)
+            region += self.pieceRect(curPiece, curx, ghosty)
+        if game.curPiece.shape() != ShapeEnum.NO_SHAPE:
+            region += self.pieceRect(game.curPiece, game.curx, game.cury)
+            region += self.pieceRect(game.curPiece, game.curx, self.ghostY())
+        dirty = game.board.takeDirty()
+        if dirty is not None:
+            self.updateWellPixmap(dirty)
+            region += self.cellsRect(*dirty)
+        if self.stats is not None:
+            region += self.overlayRect()
+        if not region.isEmpty():
+            self.update(region)
+
+    def cellsRect(self, left, right, bottom, top):
+        """Return the widget rectangle covering the given box of cells.
+
+        The rectangle has a one pixel margin, since the square outlines are
+        drawn at fractional positions and may round onto the next pixel.
+        """
+        rect = self.contentsRect()
+        squareWidth = self.squareWidth()
+        squareHeight = self.squareHeight()
+        boardTop = rect.bottom() - self.boardHeight*squareHeight
+        return QtCore.QRectF(
+            rect.left() + left*squareWidth,
+            boardTop + (self.boardHeight-top-1)*squareHeight,
+            (right-left+1)*squareWidth, (top-bottom+1)*squareHeight
+        ).toAlignedRect().adjusted(-1, -1, 1, 1)
+
+    def rowAt(self, y):
+        """Return the row of the well at the widget ordinate ``y``."""
+        boardTop = (self.contentsRect().bottom() -
+            self.boardHeight*self.squareHeight())
+        return self.boardHeight - 1 - math.floor(
+            (y - boardTop) / self.squareHeight())
+
+    def ghostY(self):
+        """Return the row where the falling piece would land."""
+        game = self.game
+        if game.curPiece.shape() == ShapeEnum.NO_SHAPE:
+            return game.cury
+        return game.board.dropRow(game.curPiece, game.curx, game.cury)
+
+    def updateWellPixmap(self, dirty, area=None):
+        """Bring the pixmap of the settled blocks up to date.
+
+        The pixmap covers the widget rectangle ``area``, by default the one
+        it already covers, so that its size follows the part of the well on
+        screen rather than the well. Only the rows of the ``dirty`` box that
+        fall inside it are redrawn, unless the pixmap has to be created for a
+        new area or pixel ratio.
+        """
+        if area is None:
+            area = self.wellRect
+        if area.isEmpty():
+            return
+        rect = self.contentsRect()
+        squareHeight = self.squareHeight()
+        boardTop = rect.bottom() - self.boardHeight*squareHeight
+        dpr = self.devicePixelRatioF()
+        pixmap = self.wellPixmap
+        if (pixmap is None or pixmap.devicePixelRatio() != dpr or
+            area != self.wellRect):
+            pixmap = QtGui.QPixmap(area.size()*dpr)
+            pixmap.setDevicePixelRatio(dpr)
+            pixmap.fill(QtCore.Qt.transparent)
+            self.wellPixmap = pixmap
+            self.wellRect = QtCore.QRect(area)
+            dirty = (0, self.boardWidth - 1, 0, self.boardHeight - 1)
+        elif dirty is None:
+            return
 
-    def showNextPiece(self):
-        if self.nxtPieceLabel is not None:
+        _, _, bottom, top = dirty
+        clip = self.cellsRect(0, self.boardWidth - 1, bottom, top).intersected(
+            self.wellRect)
+        if clip.isEmpty():
             return
-        dx = self.nxtPiece.xmax() - self.nxtPiece.xmin() + 1
-        dy = self.nxtPiece.ymax() - self.nxtPiece.ymin() + 1
+        painter = QtGui.QPainter(pixmap)
+        painter.translate(-self.wellRect.topLeft())
+        painter.setClipRect(clip)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        painter.fillRect(clip, QtCore.Qt.transparent)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+        # The rows next to the box may overlap its margin by a pixel; the
+        # rows outside the pixmap are culled.
+        rows = self.game.board.rows
+        colors = self.game.board.colors
+        for y in range(max(0, bottom - 1, self.rowAt(clip.bottom()) - 1),
+                min(self.boardHeight, top + 2, self.rowAt(clip.top()) + 2)):
+            if rows[y]:
+                self.drawRow(painter, rect.left(),
+                    boardTop + (self.boardHeight-y-1)*squareHeight,
+                    colors[y])
+        painter.end()
+
+    def overlayRect(self):
+        metrics = self.fontMetrics()
+        rect = self.visibleArea()
+        return QtCore.QRect(rect.topLeft(), QtCore.QSize(
+            metrics.horizontalAdvance("jitter 000.0/000.0 ms") + 8,
+            3*metrics.lineSpacing() + 8)).intersected(rect)
+
+    def drawOverlay(self, painter: QtGui.QPainter):
+        rect = self.overlayRect()
+        painter.fillRect(rect, QtGui.QColor(0, 0, 0, 160))
+        painter.setPen(QtCore.Qt.white)
+        painter.drawText(rect.adjusted(4, 4, -4, -4),
+            QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop,
+            "\n".join(self.stats.overlayText()))
+
+    def pieceRect(self, piece, x, y):
+        return self.cellsRect(x + piece.xmin(), x + piece.xmax(),
+            y - piece.ymax(), y - piece.ymin())
 
+    def showNextPiece(self):
+        for label, piece in zip(self.previewLabels, self.game.preview):
+            label.setPixmap(self.previewPixmap(piece.shape()))
+
+    def previewPixmap(self, shape: ShapeEnum):
+        """Return the preview of ``shape``, rendered once per square size."""
+        key = (shape, self.squareWidth(), self.squareHeight(),
+            self.devicePixelRatioF())
+        pixmap = self.previews.get(key)
+        if pixmap is not None:
+            return pixmap
+
+        piece = TetrixPiece(shape)
+        _, squareWidth, squareHeight, dpr = key
+        dx = piece.xmax() - piece.xmin() + 1
+        dy = piece.ymax() - piece.ymin() + 1
         pixmap = QtGui.QPixmap(
-            dx*self.squareWidth(), dy*self.squareHeight())
+            math.ceil(dx*squareWidth*dpr), math.ceil(dy*squareHeight*dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(QtCore.Qt.transparent)
         painter = QtGui.QPainter(pixmap)
-        painter.fillRect(
-            pixmap.rect(), self.nxtPieceLabel.palette().background())
-
-        for i in range(4):
-            x = self.nxtPiece.xcoord(i) - self.nxtPiece.xmin()
-            y = self.nxtPiece.ycoord(i) - self.nxtPiece.ymin()
-            self.drawSquare(painter, x*self.squareWidth(),
-                y*self.squareHeight(), self.nxtPiece.shape())
-
-        self.nxtPieceLabel.setPixmap(pixmap)    # FIXME
-
-    def tryMove(self, newPiece, newX, newY):
-        for i in range(4):
-            x = newX + newPiece.xcoord(i)
-            y = newY - newPiece.ycoord(i)
-            if (x < 0 or x >= TetrixBoard.BOARD_WIDTH or y < 0 or
-                y >= TetrixBoard.BOARD_HEIGHT):
-                return False
-            if self.shapeAt(x, y) != ShapeEnum.NO_SHAPE:
-                return False
-
-        self.curPiece = newPiece
-        self.curx = newX
-        self.cury = newY
-        self.update()
-        return True
+        for x, y in piece.coords:
+            self.drawSquare(painter, (x - piece.xmin())*squareWidth,
+                (y - piece.ymin())*squareHeight, shape)
+        painter.end()
+        self.previews[key] = pixmap
+        return pixmap
 
     def drawSquare(self, painter: QtGui.QPainter, x, y, shape: ShapeEnum):
-        COLOR_TABLE = [
-            0x000000, 0xCC6666, 0x66CC66, 0x6666CC,
-            0xCCCC66, 0xCC66CC, 0x66CCCC, 0xDAAA00
-        ]
-        color = QtGui.QColor(COLOR_TABLE[shape.value])
-        painter.fillRect(x+1, y+1, self.squareWidth()-2,
-            self.squareHeight()-2, color)
+        painter.drawPixmap(QtCore.QPointF(x, y), self.tile(shape))
+
+    def drawPiece(self, painter: QtGui.QPainter, piece, x, y):
+        rect = self.contentsRect()
+        squareWidth = self.squareWidth()
+        squareHeight = self.squareHeight()
+        boardTop = rect.bottom() - self.boardHeight*squareHeight
+        tile = self.tile(piece.shape())
+        for px, py in piece.coords:
+            painter.drawPixmap(QtCore.QPointF(
+                rect.left() + (x + px)*squareWidth,
+                boardTop + (self.boardHeight-(y - py)-1)*squareHeight),
+                tile)
+
+    def drawRow(self, painter: QtGui.QPainter, x, y, colors):
+        """Draw a whole row of the well, given by its colour plane."""
+        painter.drawPixmap(QtCore.QPointF(x, y), self.rowTile(colors))
+
+    def tile(self, shape: ShapeEnum):
+        key = (shape, self.squareWidth(), self.squareHeight(),
+            self.devicePixelRatioF())
+        pixmap = self.tiles.get(key)
+        if pixmap is None:
+            pixmap = self.renderTile(*key)
+            self.tiles[key] = pixmap
+        return pixmap
+
+    def rowTile(self, colors):
+        key = (bytes(colors), self.squareWidth(), self.squareHeight(),
+            self.devicePixelRatioF())
+        pixmap = self.rowTiles.get(key)
+        if pixmap is None:
+            if len(self.rowTiles) >= TetrixBoard.ROW_TILES_SIZE:
+                self.rowTiles.clear()
+            squareWidth = self.squareWidth()
+            dpr = self.devicePixelRatioF()
+            pixmap = QtGui.QPixmap(
+                math.ceil(len(colors)*squareWidth*dpr),
+                math.ceil(self.squareHeight()*dpr))
+            pixmap.setDevicePixelRatio(dpr)
+            pixmap.fill(QtCore.Qt.transparent)
+            painter = QtGui.QPainter(pixmap)
+            for j, shape in enumerate(colors):
+                if shape != ShapeEnum.NO_SHAPE:
+                    painter.drawPixmap(
+                        QtCore.QPointF(j*squareWidth, 0), self.tile(shape))
+            painter.end()
+            self.rowTiles[key] = pixmap
+        return pixmap
+
+    def renderTile(self, shape, width, height, dpr):
+        pixmap = QtGui.QPixmap(math.ceil(width*dpr), math.ceil(height*dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(QtCore.Qt.transparent)
+
+        painter = QtGui.QPainter(pixmap)
+        color = QtGui.QColor(TetrixBoard.COLOR_TABLE[shape])
+        painter.fillRect(QtCore.QRectF(1, 1, width-2, height-2), color)
 
         painter.setPen(color.lighter())
-        painter.drawLine(x, y+self.squareHeight()-1, x, y)
-        painter.drawLine(x, y, x+self.squareWidth()-1, y)
+        painter.drawLine(QtCore.QPointF(0, height-1), QtCore.QPointF(0, 0))
+        painter.drawLine(QtCore.QPointF(0, 0), QtCore.QPointF(width-1, 0))
 
         painter.setPen(color.darker())
-        painter.drawLine(x+1, y+self.squareHeight()-1,
-            x+self.squareWidth()-1, y+self.squareHeight()-1)
-        painter.drawLine(x+self.squareWidth()-1, y+self.squareHeight()-1,
-            x+self.squareWidth()-1, y+1)
-
-class TetrixPiece:
-
-    COORDS_TABLES = (
-        ((0,   0), (0,  0), (0,  0), ( 0, 0)),
-        ((0,  -1), (0,  0), (-1, 0), (-1, 1)),
-        ((0,  -1), (0,  0), ( 1, 0), ( 1, 1)),
-        ((0,  -1), (0,  0), ( 0, 1), ( 0, 2)),
-        ((-1,  0), (0,  0), ( 1, 0), ( 0, 1)),
-        (( 0,  0), (1,  0), ( 0, 1), ( 1, 1)),
-        ((-1, -1), (0, -1), ( 0, 0), ( 0, 1)),
-        (( 1, -1), (0, -1), ( 0, 0), ( 0, 1))
-    )
-
-    def __init__(self):
-        self.coords = [[0, 0] for _ in range(4)]
-        self.pieceShape = ShapeEnum.NO_SHAPE
-        self.setShape(ShapeEnum.NO_SHAPE)
-
-    def shape(self):
-        return self.pieceShape
-
-    def setShape(self, shape: ShapeEnum):
-        table = TetrixPiece.COORDS_TABLES[shape.value]
-        for i in range(4):
-            for j in range(2):
-                self.coords[i][j] = table[i][j]
-
-        self.pieceShape = shape
-
-    def setRandomShape(self):
-        SHAPES = [
-            ShapeEnum.L_SHAPE, ShapeEnum.LINE_SHAPE, ShapeEnum.MIRRORED_L_SHAPE,
-            ShapeEnum.S_SHAPE, ShapeEnum.SQUARE_SHAPE, ShapeEnum.T_SHAPE,
-            ShapeEnum.Z_SHAPE
-        ]
-        shape = random.choice(SHAPES)
-        self.setShape(shape)
-
-    def xcoord(self, index):
-        return self.coords[index][0]
-
-    def ycoord(self, index):
-        return self.coords[index][1]
-
-    def setXCoord(self, index, x):
-        self.coords[index][0] = x
-
-    def setYCoord(self, index, y):
-        self.coords[index][1] = y
-
-    def xmin(self):
-        vmin = self.coords[0][0]
-        for i in range(4):
-            vmin = min(vmin, self.coords[i][0])
-        return vmin
-
-    def xmax(self):
-        vmax = self.coords[0][0]
-        for i in range(4):
-            vmax = max(vmax, self.coords[i][0])
-        return vmax
-
-    def ymin(self):
-        vmin = self.coords[0][1]
-        for i in range(4):
-            vmin = min(vmin, self.coords[i][1])
-        return vmin
-
-    def ymax(self):
-        vmax = self.coords[0][1]
-        for i in range(4):
-            vmax = max(vmax, self.coords[i][1])
-        return vmax
-
-    def rotatedLeft(self):
-        if self.pieceShape == ShapeEnum.SQUARE_SHAPE:
-            return self
-
-        result = TetrixPiece()
-        result.pieceShape = self.pieceShape
-        for i in range(4):
-            result.setXCoord(i, self.ycoord(i))
-            result.setYCoord(i, -self.xcoord(i))
-        return result
-
-    def rotatedRight(self):
-        if self.pieceShape == ShapeEnum.SQUARE_SHAPE:
-            return self
-
-        result = TetrixPiece()
-        result.pieceShape = self.pieceShape
-        for i in range(4):
-            result.setXCoord(i, -self.ycoord(i))
-            result.setYCoord(i, self.xcoord(i))
-        return result
+        painter.drawLine(QtCore.QPointF(1, height-1),
+            QtCore.QPointF(width-1, height-1))
+        painter.drawLine(QtCore.QPointF(width-1, height-1),
+            QtCore.QPointF(width-1, 1))
+        painter.end()
+        return pixmap
 
 
 if __name__ == "__main__":
+    import argparse
     import sys
-    import time
 
-    app = QtWidgets.QApplication(sys.argv)
-    tetrix = TetrixWindow()
-    tetrix.show()
+    from tetrixreplay import TetrixRecording
+    from tetrixstats import TetrixStats
+
+    parser = argparse.ArgumentParser(description="Tetrix")
+    parser.add_argument("--record", metavar="FILE",
+        help="record the games into FILE")
+    parser.add_argument("--replay", metavar="FILE",
+        help="play back the game recorded in FILE")
+    parser.add_argument("--speed", type=float, default=1.0,
+        help="playback speed factor (default: 1)")
+    parser.add_argument("--size", metavar="WxH", default=None,
+        help="well size in squares, e.g. 100x400 (default: 10x22)")
+    parser.add_argument("--preview", type=int, default=1, choices=range(1, 6),
+        metavar="N", help="number of upcoming pieces shown, 1 to 5 (default: 1)")
+    parser.add_argument("--profile", metavar="FILE",
+        help="overlay timings on the board and dump them as JSON into FILE")
+    args, qtArgs = parser.parse_known_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qtArgs)
     random.seed(time.time())
+    width, height = TetrixGame.BOARD_WIDTH, TetrixGame.BOARD_HEIGHT
+    if args.size:
+        width, height = (int(n) for n in args.size.lower().split("x"))
+    recording = None
+    if args.replay:
+        recording = TetrixRecording.load(args.replay)
+        width, height = recording.width, recording.height
+    tetrix = TetrixWindow(app, width, height, args.preview)
+    tetrix.show()
+    if args.record:
+        tetrix.board.setRecordPath(args.record)
+        app.aboutToQuit.connect(tetrix.board.saveRecording)
+    if args.profile:
+        stats = TetrixStats()
+        tetrix.board.setStats(stats)
+        app.aboutToQuit.connect(lambda: stats.dump(args.profile))
+    if recording is not None:
+        tetrix.board.replay(recording, args.speed)
     sys.exit(app.exec())
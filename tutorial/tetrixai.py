@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Tetrix autoplayer
+
+*TetrixAI* picks where to drop the current piece of a *TetrixGame*. It tries
+every (rotation, column) placement of ``curPiece``, then every placement of
+``nxtPiece`` on each resulting well, and keeps the placement leading to the
+best scored well. Wells are scored with the usual linear heuristic on the
+aggregate height, the removed lines, the holes and the bumpiness.
+
+The score of a well only depends on its rows, so evaluations are memoized in
+an LRU transposition table keyed by the tuple of row bitmasks. Only the rows
+up to the top of the stack are kept, so that the search costs as much in a
+large well as in a small one with the same stack. The lookahead
+branches can fan out across a ``ProcessPoolExecutor``; every worker process
+keeps its own transposition table between tasks.
+
+An AI is a policy for ``TetrixGame.run()``, and running this module plays
+headless games with it::
+
+    python tetrixai.py --pieces 1000 --workers 4
+"""
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from tetrixcore import ActionEnum, ShapeEnum, TetrixPiece, heightProfile
+
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+
+TRANSPOSITION_TABLE_SIZE = 1 << 16
+
+
+@functools.lru_cache(maxsize=TRANSPOSITION_TABLE_SIZE)
+def evaluateRows(rows, width):
+    """Return the heuristic score of the well ``rows``, removed lines aside."""
+    heights = heightProfile(rows, width)
+    holes = 0
+    covered = 0
+    for y in range(len(rows) - 1, -1, -1):
+        holes += (covered & ~rows[y]).bit_count()
+        covered |= rows[y]
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return (HEIGHT_WEIGHT*sum(heights) + HOLES_WEIGHT*holes +
+        BUMPINESS_WEIGHT*bumpiness)
+
+
+def placements(rows, width, shape, height):
+    """Yield ``(piece, x, rows, numFullLines)`` for every drop of ``shape``.
+
+    ``rows`` are the rows of a well ``height`` rows high up to the top of its
+    stack, the rows above being empty. The pieces are dropped straight down
+    from above the well, and the rows returned are the ones left once the
+    full lines are removed, again up to the top of the stack.
+    """
+    fullMask = (1 << width) - 1
+    heights = heightProfile(rows, width)
+    for piece in dict.fromkeys(TetrixPiece.PIECES[shape]):
+        for x in range(-piece.xmin(), width - piece.xmax()):
+            y = max(heights[x + px] + py for px, py in piece.bottoms())
+            if y - piece.ymin() >= height:
+                continue
+            placed = list(rows)
+            placed.extend([0] * (y - piece.ymin() + 1 - len(placed)))
+            left = x + piece.xmin()
+            for ycoord, mask in piece.rowMasks():
+                placed[y - ycoord] |= mask << left
+            kept = [row for row in placed if row != fullMask]
+            yield piece, x, tuple(kept), len(placed) - len(kept)
+
+
+def bestFollowUp(rows, width, shape, height):
+    """Return the best score reachable by dropping ``shape`` on ``rows``."""
+    best = None
+    for _, _, placed, numFullLines in placements(rows, width, shape, height):
+        score = evaluateRows(placed, width) + LINES_WEIGHT*numFullLines
+        if best is None or score > best:
+            best = score
+    return best
+
+
+def route(board, piece, x, y, target, tx):
+    """Return the actions taking ``piece`` at (x, y) to ``target`` at ``tx``.
+
+    The piece is rotated first, moving down a line whenever the ceiling is in
+    the way, then shifted sideways. Returns None when the target cannot be
+    reached that way.
+    """
+    actions = []
+    turns = (target.rotation - piece.rotation) % 4
+    if turns == 3:
+        action, turns = ActionEnum.ROTATE_RIGHT, 1
+    else:
+        action = ActionEnum.ROTATE_LEFT
+    for _ in range(turns):
+        if action == ActionEnum.ROTATE_RIGHT:
+            turned = piece.rotatedRight()
+        else:
+            turned = piece.rotatedLeft()
+        while board.collides(turned, x, y):
+            if board.collides(piece, x, y - 1):
+                return None
+            y -= 1
+            actions.append(ActionEnum.ONE_LINE_DOWN)
+        piece = turned
+        actions.append(action)
+
+    step, action = ((1, ActionEnum.MOVE_RIGHT) if tx > x else
+        (-1, ActionEnum.MOVE_LEFT))
+    while x != tx:
+        x += step
+        if board.collides(piece, x, y):
+            return None
+        actions.append(action)
+    return actions
+
+
+class TetrixAI:
+    """Placement search for the current piece of a *TetrixGame*.
+
+    With ``workers`` greater than 0, the lookahead on the next piece runs in
+    a pool of that many processes; call ``close()`` to shut it down.
+    """
+
+    def __init__(self, lookahead=True, workers=0):
+        self.lookahead = lookahead
+        self.executor = None
+        if workers > 0:
+            self.executor = ProcessPoolExecutor(workers)
+
+    def __call__(self, game):
+        return self.actions(game)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def bestPlacement(self, game):
+        """Return the actions moving the current piece to its best drop.
+
+        Only the placements the piece can reach from where it is are tried.
+        Returns None when there is no piece or no reachable placement.
+        """
+        if game.curPiece.shape() == ShapeEnum.NO_SHAPE:
+            return None
+
+        width = game.board.width
+        height = game.board.height
+        rows = tuple(itertools.islice(game.board.rows, max(game.board.heights)))
+        branches = []
+        for branch in placements(rows, width, game.curPiece.shape(), height):
+            actions = route(game.board, game.curPiece, game.curx, game.cury,
+                branch[0], branch[1])
+            if actions is not None:
+                branches.append((actions,) + branch[2:])
+        if not branches:
+            return None
+
+        if self.lookahead and game.nxtPiece.shape() != ShapeEnum.NO_SHAPE:
+            shape = game.nxtPiece.shape()
+            args = ([placed for _, placed, _ in branches],
+                [width] * len(branches), [shape] * len(branches),
+                [height] * len(branches))
+            if self.executor is not None:
+                followUps = self.executor.map(bestFollowUp, *args, chunksize=4)
+            else:
+                followUps = map(bestFollowUp, *args)
+        else:
+            followUps = (evaluateRows(placed, width)
+                for _, placed, _ in branches)
+
+        best = None
+        bestScore = None
+        for (actions, _, numFullLines), score in zip(branches, followUps):
+            if score is None:
+                continue
+            score += LINES_WEIGHT*numFullLines
+            if bestScore is None or score > bestScore:
+                best = actions
+                bestScore = score
+        if best is None:
+            # Every follow-up tops out; settle for the best single drop.
+            best, _, _ = max(branches, key=lambda branch:
+                evaluateRows(branch[1], width) + LINES_WEIGHT*branch[2])
+        return best
+
+    def actions(self, game):
+        """Return the actions that drop the current piece at its best place."""
+        actions = self.bestPlacement(game)
+        if actions is None:
+            return [ActionEnum.DROP_DOWN]
+        return actions + [ActionEnum.DROP_DOWN]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from tetrixcore import TetrixGame
+
+    parser = argparse.ArgumentParser(description="Headless Tetrix autoplay")
+    parser.add_argument("--pieces", type=int, default=1000,
+        help="number of pieces to play (default: 1000)")
+    parser.add_argument("--workers", type=int, default=0,
+        help="processes for the lookahead (default: 0, in process)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    ai = TetrixAI(workers=args.workers)
+    game = TetrixGame(args.seed)
+    t0 = time.perf_counter()
+    numPieces = game.run(args.pieces, ai)
+    elapsed = time.perf_counter() - t0
+    ai.close()
+    print(f"{numPieces} pieces, {game.numLinesRemoved} lines, score "
+        f"{game.score} in {elapsed:.2f} s ({numPieces / elapsed:.0f} pieces/s)")
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Tetrix batch simulator
+
+*TetrixBatch* plays N independent Tetrix games at once. The wells are kept in
+a single ``(N, BOARD_HEIGHT, BOARD_WIDTH)`` uint8 array holding the
+``ShapeEnum`` value of every cell, row 0 being the bottom of the well as in
+*TetrixWell*. Moves, rotations, drops and full-line clears are applied to all
+the boards with vectorized NumPy operations, which is what policy searches
+over tens of thousands of concurrent games need.
+
+The rules follow *TetrixGame*, except that there is no pause after removed
+lines: the next piece is spawned as soon as the lines are gone.
+"""
+import numpy as np
+
+from tetrixcore import ActionEnum, ShapeEnum, TetrixGame, TetrixPiece
+
+
+def rotationTables():
+    """Return the cells of every shape and rotation, as a (8, 4, 4, 2) array.
+
+    Rotation ``r`` is the interned ``TetrixPiece(shape, r)``.
+    """
+    return np.array(
+        [[piece.coords for piece in rotations]
+            for rotations in TetrixPiece.PIECES],
+        dtype=np.int64)
+
+
+class TetrixBatch:
+    """N Tetrix games advanced together."""
+    BOARD_WIDTH = TetrixGame.BOARD_WIDTH
+    BOARD_HEIGHT = TetrixGame.BOARD_HEIGHT
+
+    COORDS = rotationTables()
+    YMIN = COORDS[..., 1].min(axis=2)
+
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros(
+            (n, TetrixBatch.BOARD_HEIGHT, TetrixBatch.BOARD_WIDTH),
+            dtype=np.uint8)
+        self.isStarted = np.zeros(n, dtype=bool)
+        self.curShape = np.zeros(n, dtype=np.int64)
+        self.nxtShape = self.randomShapes(n)
+        self.rotation = np.zeros(n, dtype=np.int64)
+        self.curx = np.zeros(n, dtype=np.int64)
+        self.cury = np.zeros(n, dtype=np.int64)
+        self.numLinesRemoved = np.zeros(n, dtype=np.int64)
+        self.numPiecesDropped = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.level = np.zeros(n, dtype=np.int64)
+
+    def randomShapes(self, count):
+        return self.rng.integers(
+            ShapeEnum.Z_SHAPE, ShapeEnum.MIRRORED_L_SHAPE + 1, count)
+
+    def start(self):
+        self.boards[:] = ShapeEnum.NO_SHAPE
+        self.isStarted[:] = True
+        self.numLinesRemoved[:] = 0
+        self.numPiecesDropped[:] = 0
+        self.score[:] = 0
+        self.level[:] = 1
+        self.newPieces(np.arange(self.n))
+
+    def step(self, actions):
+        """Apply one action per board and return the points they scored.
+
+        ``actions`` is an array of ``ActionEnum`` values, one for each board.
+        Boards whose game is over ignore their action.
+        """
+        actions = np.asarray(actions)
+        score = self.score.copy()
+        isStarted = self.isStarted
+
+        idx = np.flatnonzero(isStarted & (actions == ActionEnum.MOVE_LEFT))
+        self.tryMove(idx, self.rotation[idx], self.curx[idx]-1, self.cury[idx])
+        idx = np.flatnonzero(isStarted & (actions == ActionEnum.MOVE_RIGHT))
+        self.tryMove(idx, self.rotation[idx], self.curx[idx]+1, self.cury[idx])
+        idx = np.flatnonzero(isStarted & (actions == ActionEnum.ROTATE_RIGHT))
+        self.tryMove(
+            idx, (self.rotation[idx]-1) % 4, self.curx[idx], self.cury[idx])
+        idx = np.flatnonzero(isStarted & (actions == ActionEnum.ROTATE_LEFT))
+        self.tryMove(
+            idx, (self.rotation[idx]+1) % 4, self.curx[idx], self.cury[idx])
+
+        idx = np.flatnonzero(isStarted & (
+            (actions == ActionEnum.ONE_LINE_DOWN) | (actions == ActionEnum.TICK)))
+        moved = self.tryMove(
+            idx, self.rotation[idx], self.curx[idx], self.cury[idx]-1)
+        landed = idx[~moved]
+        self.piecesDropped(landed, np.zeros(len(landed), dtype=np.int64))
+
+        idx = np.flatnonzero(isStarted & (actions == ActionEnum.DROP_DOWN))
+        self.dropDown(idx)
+
+        return self.score - score
+
+    def run(self, n_pieces, policy=None):
+        """Play up to ``n_pieces`` pieces on every board.
+
+        Each round applies the actions returned by ``policy(batch)``, followed
+        by one gravity tick. Without a policy every piece is dropped where it
+        spawns. Returns the number of pieces dropped on each board.
+        """
+        if not self.isStarted.any():
+            self.start()
+
+        numPiecesDropped = self.numPiecesDropped.copy()
+        target = numPiecesDropped + n_pieces
+        dropAll = np.full(self.n, ActionEnum.DROP_DOWN)
+        while True:
+            active = self.isStarted & (self.numPiecesDropped < target)
+            if not active.any():
+                break
+            actions = dropAll if policy is None else policy(self)
+            self.step(np.where(active, actions, ActionEnum.NO_ACTION))
+            active &= self.isStarted & (self.numPiecesDropped < target)
+            self.step(np.where(active, ActionEnum.TICK, ActionEnum.NO_ACTION))
+        return self.numPiecesDropped - numPiecesDropped
+
+    def cells(self, shape, rotation, x, y):
+        """Return the board columns and rows covered by the given pieces."""
+        coords = TetrixBatch.COORDS[shape, rotation]
+        return x[:, None] + coords[..., 0], y[:, None] - coords[..., 1]
+
+    def fits(self, idx, shape, rotation, x, y):
+        xs, ys = self.cells(shape, rotation, x, y)
+        inside = ((xs >= 0) & (xs < TetrixBatch.BOARD_WIDTH) &
+            (ys >= 0) & (ys < TetrixBatch.BOARD_HEIGHT)).all(axis=1)
+        occupied = self.boards[
+            idx[:, None],
+            ys.clip(0, TetrixBatch.BOARD_HEIGHT-1),
+            xs.clip(0, TetrixBatch.BOARD_WIDTH-1)].any(axis=1)
+        return inside & ~occupied
+
+    def tryMove(self, idx, rotation, x, y):
+        """Move the pieces of boards ``idx`` where they fit; return the mask."""
+        fits = self.fits(idx, self.curShape[idx], rotation, x, y)
+        moved = idx[fits]
+        self.rotation[moved] = rotation[fits]
+        self.curx[moved] = x[fits]
+        self.cury[moved] = y[fits]
+        return fits
+
+    def newPieces(self, idx):
+        shape = self.nxtShape[idx]
+        self.curShape[idx] = shape
+        self.nxtShape[idx] = self.randomShapes(len(idx))
+        self.rotation[idx] = 0
+        self.curx[idx] = (TetrixBatch.BOARD_WIDTH // 2) + 1
+        self.cury[idx] = (
+            TetrixBatch.BOARD_HEIGHT - 1 + TetrixBatch.YMIN[shape, 0])
+
+        fits = self.fits(
+            idx, shape, self.rotation[idx], self.curx[idx], self.cury[idx])
+        over = idx[~fits]
+        self.curShape[over] = ShapeEnum.NO_SHAPE
+        self.isStarted[over] = False
+
+    def dropDown(self, idx):
+        dropHeight = np.zeros(self.n, dtype=np.int64)
+        falling = idx
+        while len(falling):
+            fits = self.tryMove(
+                falling, self.rotation[falling], self.curx[falling],
+                self.cury[falling]-1)
+            falling = falling[fits]
+            dropHeight[falling] += 1
+
+        self.piecesDropped(idx, dropHeight[idx])
+
+    def piecesDropped(self, idx, dropHeight):
+        shape = self.curShape[idx]
+        xs, ys = self.cells(
+            shape, self.rotation[idx], self.curx[idx], self.cury[idx])
+        self.boards[idx[:, None], ys, xs] = shape[:, None]
+
+        self.numPiecesDropped[idx] += 1
+        self.level[idx] += self.numPiecesDropped[idx] % 25 == 0
+        self.score[idx] += dropHeight + 7
+
+        self.removeFullLines(idx)
+        self.newPieces(idx)
+
+    def removeFullLines(self, idx):
+        full = self.boards[idx].all(axis=2)
+        numFullLines = full.sum(axis=1)
+        cleared = numFullLines > 0
+        if not cleared.any():
+            return
+
+        idx = idx[cleared]
+        full = full[cleared]
+        # Stable sort keeps the remaining rows in order at the bottom and
+        # moves the full ones to the top, where they are emptied.
+        order = np.argsort(full, axis=1, kind="stable")
+        boards = np.take_along_axis(self.boards[idx], order[:, :, None], axis=1)
+        boards[np.take_along_axis(full, order, axis=1)] = ShapeEnum.NO_SHAPE
+        self.boards[idx] = boards
+
+        self.numLinesRemoved[idx] += numFullLines[cleared]
+        self.score[idx] += 10 * numFullLines[cleared]
@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""Tetrix game core
+
+The rules of the Tetrix game without any Qt dependency. *TetrixGame* owns the
+well, the falling piece and the score, and advances only when it is told to,
+either one action at a time by the *TetrixBoard* widget or in batch through
+``step()`` and ``run()``. Without widgets, painting or timers in the way it
+plays thousands of pieces per second, which is what AI-agent evaluations and
+regression replays need.
+"""
+import collections
+import random
+from enum import IntEnum
+
+
+class ShapeEnum(IntEnum):
+    NO_SHAPE = 0
+    Z_SHAPE = 1
+    S_SHAPE = 2
+    LINE_SHAPE = 3
+    T_SHAPE = 4
+    SQUARE_SHAPE = 5
+    L_SHAPE = 6
+    MIRRORED_L_SHAPE = 7
+
+
+class ActionEnum(IntEnum):
+    NO_ACTION = 0
+    MOVE_LEFT = 1
+    MOVE_RIGHT = 2
+    ROTATE_RIGHT = 3
+    ROTATE_LEFT = 4
+    ONE_LINE_DOWN = 5
+    DROP_DOWN = 6
+    TICK = 7
+
+
+def heightProfile(rows, width, top=None):
+    """Return the height of every column of the row bitmasks ``rows``.
+
+    The rows above ``top``, when given, must be empty and are skipped.
+    """
+    heights = [0] * width
+    fullMask = (1 << width) - 1
+    seen = 0
+    if top is None:
+        top = len(rows)
+    for y in range(top - 1, -1, -1):
+        new = rows[y] & ~seen
+        if not new:
+            continue
+        seen |= new
+        while new:
+            bit = new & -new
+            heights[bit.bit_length() - 1] = y + 1
+            new ^= bit
+        if seen == fullMask:
+            break
+    return heights
+
+
+class TetrixWell:
+    """Occupancy layer of the Tetrix well.
+
+    Every row is stored as an integer bitmask, bit ``x`` being set when the
+    column ``x`` is occupied, and row 0 is the bottom of the well. A parallel
+    colour plane keeps the shape of every cell as one ``bytearray`` per row.
+    With this layout a full row is simply ``row == fullMask`` and collisions
+    are mask ANDs. Both are ``deque`` rings, so that a cleared line is
+    deleted in place and an empty row pushed on top without moving the rest
+    of the well, and only the rows a locked piece covers are checked for
+    full lines. The cost of a move stays the same however large the well is.
+
+    The cells changed since the last ``takeDirty()`` are tracked as one
+    ``(left, right, bottom, top)`` box so that views repaint only those.
+
+    ``heights`` is the column height profile: the row above the topmost
+    occupied cell of every column. It is kept up to date on locks and clears
+    and gives the landing row of a dropped piece in one pass.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.fullMask = (1 << width) - 1
+        self.rows = None
+        self.colors = None
+        self.heights = None
+        self.dirty = None
+        self.clear()
+
+    def clear(self):
+        self.rows = collections.deque([0] * self.height)
+        self.colors = collections.deque(
+            bytearray(self.width) for _ in range(self.height))
+        self.heights = [0] * self.width
+        self.markDirty(0, self.width - 1, 0, self.height - 1)
+
+    def updateHeights(self, top=None):
+        """Recompute the height profile from the rows, up to ``top``."""
+        self.heights = heightProfile(self.rows, self.width, top)
+
+    def columnHeights(self):
+        return tuple(self.heights)
+
+    def markDirty(self, left, right, bottom, top):
+        if self.dirty is not None:
+            dleft, dright, dbottom, dtop = self.dirty
+            left = min(left, dleft)
+            right = max(right, dright)
+            bottom = min(bottom, dbottom)
+            top = max(top, dtop)
+        self.dirty = (left, right, bottom, top)
+
+    def takeDirty(self):
+        """Return the box changed since the last call, or None."""
+        dirty = self.dirty
+        self.dirty = None
+        return dirty
+
+    def shapeAt(self, x, y):
+        return ShapeEnum(self.colors[y][x])
+
+    def setShapeAt(self, x, y, shape: ShapeEnum):
+        if shape == ShapeEnum.NO_SHAPE:
+            self.rows[y] &= ~(1 << x)
+            if self.heights[x] == y + 1:
+                self.updateHeights()
+        else:
+            self.rows[y] |= 1 << x
+            self.heights[x] = max(self.heights[x], y + 1)
+        self.colors[y][x] = shape
+        self.markDirty(x, x, y, y)
+
+    def collides(self, piece, x, y):
+        left = x + piece.xmin()
+        if left < 0 or x + piece.xmax() >= self.width:
+            return True
+        rows = self.rows
+        for ycoord, mask in piece.rowMasks():
+            row = y - ycoord
+            if row < 0 or row >= self.height or rows[row] & (mask << left):
+                return True
+        return False
+
+    def dropRow(self, piece, x, y):
+        """Return the lowest row ``piece`` can fall to from row ``y``."""
+        heights = self.heights
+        landing = max(heights[x + px] + py for px, py in piece.bottoms())
+        if landing <= y:
+            return landing
+
+        # The piece is below the top of a column, e.g. it was slid under an
+        # overhang, so the cells under it have to be checked row by row.
+        while not self.collides(piece, x, y - 1):
+            y -= 1
+        return y
+
+    def lockPiece(self, piece, x, y):
+        shape = piece.shape()
+        heights = self.heights
+        for px, py in piece.coords:
+            self.rows[y - py] |= 1 << (x + px)
+            self.colors[y - py][x + px] = shape
+            if heights[x + px] < y - py + 1:
+                heights[x + px] = y - py + 1
+        self.markDirty(
+            x + piece.xmin(), x + piece.xmax(), y - piece.ymax(), y - piece.ymin())
+
+    def removeFullLines(self, bottom=0, top=None):
+        """Remove the full lines between rows ``bottom`` and ``top``.
+
+        Only rows that just had cells added can have become full, so the
+        caller passes the rows of the piece it locked.
+        """
+        if top is None:
+            top = self.height - 1
+        rows = self.rows
+        full = [y for y in range(top, bottom - 1, -1)
+            if rows[y] == self.fullMask]
+        if full:
+            # Nothing changes above the topmost block of the well.
+            stackTop = max(self.heights)
+            self.markDirty(0, self.width - 1, full[-1], stackTop - 1)
+            for y in full:
+                del rows[y]
+                del self.colors[y]
+            rows.extend([0] * len(full))
+            self.colors.extend(bytearray(self.width) for _ in full)
+            self.updateHeights(stackTop)
+        return len(full)
+
+
+class TetrixPiece:
+    """One rotation of a Tetrix shape.
+
+    Pieces are immutable and interned: the 4 rotations of every shape are
+    built once at import, with their bounding boxes, row masks and bottom
+    offsets, and ``TetrixPiece(shape, rotation)`` only looks them up.
+    Rotating a piece is therefore a change of rotation index that allocates
+    nothing. Rotation ``r`` is the shape of ``COORDS_TABLES`` rotated left
+    ``r`` times.
+    """
+
+    COORDS_TABLES = (
+        ((0,   0), (0,  0), (0,  0), ( 0, 0)),
+        ((0,  -1), (0,  0), (-1, 0), (-1, 1)),
+        ((0,  -1), (0,  0), ( 1, 0), ( 1, 1)),
+        ((0,  -1), (0,  0), ( 0, 1), ( 0, 2)),
+        ((-1,  0), (0,  0), ( 1, 0), ( 0, 1)),
+        (( 0,  0), (1,  0), ( 0, 1), ( 1, 1)),
+        ((-1, -1), (0, -1), ( 0, 0), ( 0, 1)),
+        (( 1, -1), (0, -1), ( 0, 0), ( 0, 1))
+    )
+
+    SHAPES = (
+        ShapeEnum.L_SHAPE, ShapeEnum.LINE_SHAPE, ShapeEnum.MIRRORED_L_SHAPE,
+        ShapeEnum.S_SHAPE, ShapeEnum.SQUARE_SHAPE, ShapeEnum.T_SHAPE,
+        ShapeEnum.Z_SHAPE
+    )
+
+    PIECES = ()
+
+    __slots__ = (
+        "pieceShape", "rotation", "coords", "_xmin", "_xmax", "_ymin",
+        "_ymax", "_rowMasks", "_bottoms"
+    )
+
+    def __new__(cls, shape=ShapeEnum.NO_SHAPE, rotation=0):
+        return TetrixPiece.PIECES[shape][rotation % 4]
+
+    @classmethod
+    def create(cls, shape, rotation, coords):
+        piece = object.__new__(cls)
+        piece.pieceShape = ShapeEnum(shape)
+        piece.rotation = rotation
+        piece.coords = coords
+        xs = [x for x, _ in coords]
+        ys = [y for _, y in coords]
+        piece._xmin = min(xs)
+        piece._xmax = max(xs)
+        piece._ymin = min(ys)
+        piece._ymax = max(ys)
+        masks = {}
+        for x, y in coords:
+            masks[y] = masks.get(y, 0) | (1 << (x - piece._xmin))
+        piece._rowMasks = tuple(masks.items())
+        bottoms = {}
+        for x, y in coords:
+            bottoms[x] = max(bottoms.get(x, y), y)
+        piece._bottoms = tuple(bottoms.items())
+        return piece
+
+    @classmethod
+    def randomPiece(cls, rng=random):
+        return TetrixPiece(rng.choice(TetrixPiece.SHAPES))
+
+    def __repr__(self):
+        return f"TetrixPiece({self.pieceShape.name}, {self.rotation})"
+
+    def shape(self):
+        return self.pieceShape
+
+    def xcoord(self, index):
+        return self.coords[index][0]
+
+    def ycoord(self, index):
+        return self.coords[index][1]
+
+    def xmin(self):
+        return self._xmin
+
+    def xmax(self):
+        return self._xmax
+
+    def ymin(self):
+        return self._ymin
+
+    def ymax(self):
+        return self._ymax
+
+    def rowMasks(self):
+        """Return the piece as ``(ycoord, mask)`` pairs, one per row.
+
+        Bit ``i`` of a mask stands for the column ``xmin() + i``.
+        """
+        return self._rowMasks
+
+    def bottoms(self):
+        """Return ``(xcoord, ycoord)`` of the lowest cell of every column.
+
+        The lowest cells have the largest ``ycoord``, since board rows are
+        ``y - ycoord``.
+        """
+        return self._bottoms
+
+    def rotatedLeft(self):
+        return TetrixPiece.PIECES[self.pieceShape][(self.rotation + 1) % 4]
+
+    def rotatedRight(self):
+        return TetrixPiece.PIECES[self.pieceShape][(self.rotation - 1) % 4]
+
+
+def _createPieces():
+    pieces = []
+    for shape, coords in enumerate(TetrixPiece.COORDS_TABLES):
+        if shape in (ShapeEnum.NO_SHAPE, ShapeEnum.SQUARE_SHAPE):
+            pieces.append((TetrixPiece.create(shape, 0, coords),) * 4)
+            continue
+        rotations = []
+        for rotation in range(4):
+            rotations.append(TetrixPiece.create(shape, rotation, coords))
+            coords = tuple((y, -x) for x, y in coords)
+        pieces.append(tuple(rotations))
+    return tuple(pieces)
+
+
+TetrixPiece.PIECES = _createPieces()
+
+
+def pieceSequence(rng=random, bag=False):
+    """Yield the pieces to play, in rotation 0, drawn from ``rng``.
+
+    Every shape is equally likely each time unless ``bag`` is true, in which
+    case the shapes are dealt from shuffled bags of all 7, so that no shape
+    is ever more than 12 pieces away.
+    """
+    if not bag:
+        while True:
+            yield TetrixPiece.randomPiece(rng)
+    while True:
+        shapes = list(TetrixPiece.SHAPES)
+        rng.shuffle(shapes)
+        for shape in shapes:
+            yield TetrixPiece(shape)
+
+
+class TetrixGame:
+    """Game state of one Tetrix well.
+
+    The methods mirror the game logic of *TetrixBoard*. ``TICK`` stands for
+    one gravity timeout: it moves the piece one line down, or spawns the next
+    piece when the game is waiting after removed lines. The game is
+    reproducible: the same seed and actions always play the same game.
+
+    The well is ``BOARD_WIDTH`` columns by ``BOARD_HEIGHT`` rows unless other
+    dimensions are given, e.g. 100 by 400 for stress tests. ``preview`` holds
+    the next ``previewSize`` pieces, ``nxtPiece`` first; how far it looks
+    ahead does not change the game, but ``bag`` does.
+    """
+    BOARD_WIDTH = 10
+    BOARD_HEIGHT = 22
+
+    def __init__(self, seed=None, width=BOARD_WIDTH, height=BOARD_HEIGHT,
+        bag=False, previewSize=1):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.board = TetrixWell(width, height)
+        self.isStarted = False
+        self.isWaitingAfterLine = False
+        self.curPiece = TetrixPiece()
+        self.bag = bag
+        self.pieces = pieceSequence(self.rng, bag)
+        self.preview = collections.deque(
+            next(self.pieces) for _ in range(max(1, previewSize)))
+        self.nxtPiece = self.preview[0]
+        self.curx = 0
+        self.cury = 0
+        self.numLinesRemoved = 0
+        self.numPiecesDropped = 0
+        self.score = 0
+        self.level = 0
+
+    def shapeAt(self, x, y):
+        return self.board.shapeAt(x, y)
+
+    def start(self):
+        self.isStarted = True
+        self.isWaitingAfterLine = False
+        self.numLinesRemoved = 0
+        self.numPiecesDropped = 0
+        self.score = 0
+        self.level = 1
+        self.board.clear()
+        self.newPiece()
+
+    def step(self, actions):
+        """Apply ``actions`` in order and return the points they scored."""
+        score = self.score
+        for action in actions:
+            if not self.isStarted:
+                break
+            if action == ActionEnum.TICK:
+                if self.isWaitingAfterLine:
+                    self.isWaitingAfterLine = False
+                    self.newPiece()
+                else:
+                    self.oneLineDown()
+            elif self.curPiece.shape() == ShapeEnum.NO_SHAPE:
+                continue
+            elif action == ActionEnum.MOVE_LEFT:
+                self.tryMove(self.curPiece, self.curx-1, self.cury)
+            elif action == ActionEnum.MOVE_RIGHT:
+                self.tryMove(self.curPiece, self.curx+1, self.cury)
+            elif action == ActionEnum.ROTATE_RIGHT:
+                self.tryMove(self.curPiece.rotatedRight(), self.curx, self.cury)
+            elif action == ActionEnum.ROTATE_LEFT:
+                self.tryMove(self.curPiece.rotatedLeft(), self.curx, self.cury)
+            elif action == ActionEnum.ONE_LINE_DOWN:
+                self.oneLineDown()
+            elif action == ActionEnum.DROP_DOWN:
+                self.dropDown()
+        return self.score - score
+
+    def run(self, n_pieces, policy=None):
+        """Play up to ``n_pieces`` pieces and return how many were dropped.
+
+        ``policy(game)`` returns the actions for the current piece; a piece
+        still falling afterwards is dropped. Without a policy every piece is
+        dropped where it spawns. The game stops early when the well is full.
+        """
+        if not self.isStarted:
+            self.start()
+
+        numPiecesDropped = self.numPiecesDropped
+        target = numPiecesDropped + n_pieces
+        while self.isStarted and self.numPiecesDropped < target:
+            dropped = self.numPiecesDropped
+            if policy is not None:
+                self.step(policy(self))
+            if self.isStarted and self.numPiecesDropped == dropped:
+                self.step((ActionEnum.DROP_DOWN,))
+            if self.isWaitingAfterLine:
+                self.step((ActionEnum.TICK,))
+        return self.numPiecesDropped - numPiecesDropped
+
+    def newPiece(self):
+        self.curPiece = self.preview.popleft()
+        self.preview.append(next(self.pieces))
+        self.nxtPiece = self.preview[0]
+        self.curx = (self.board.width // 2) + 1
+        self.cury = self.board.height - 1 + self.curPiece.ymin()
+
+        if not self.tryMove(self.curPiece, self.curx, self.cury):
+            self.curPiece = TetrixPiece()
+            self.isStarted = False
+
+    def tryMove(self, newPiece, newX, newY):
+        if self.board.collides(newPiece, newX, newY):
+            return False
+
+        self.curPiece = newPiece
+        self.curx = newX
+        self.cury = newY
+        return True
+
+    def dropDown(self):
+        newy = self.board.dropRow(self.curPiece, self.curx, self.cury)
+        dropHeight = self.cury - newy
+        self.tryMove(self.curPiece, self.curx, newy)
+        self.pieceDropped(dropHeight)
+
+    def columnHeights(self):
+        return self.board.columnHeights()
+
+    def oneLineDown(self):
+        if not self.tryMove(self.curPiece, self.curx, self.cury-1):
+            self.pieceDropped(0)
+
+    def pieceDropped(self, dropHeight):
+        self.board.lockPiece(self.curPiece, self.curx, self.cury)
+
+        self.numPiecesDropped += 1
+        if self.numPiecesDropped % 25 == 0:
+            self.level += 1
+
+        self.score += dropHeight + 7
+        self.removeFullLines(self.cury - self.curPiece.ymax(),
+            self.cury - self.curPiece.ymin())
+
+        if not self.isWaitingAfterLine:
+            self.newPiece()
+
+    def removeFullLines(self, bottom=0, top=None):
+        numFullLines = self.board.removeFullLines(bottom, top)
+        if numFullLines > 0:
+            self.numLinesRemoved += numFullLines
+            self.score += 10 * numFullLines
+            self.isWaitingAfterLine = True
+            self.curPiece = TetrixPiece()
+        return numFullLines
+
+
+class GravityClock:
+    """Fixed-timestep gravity of a *TetrixGame*.
+
+    Time comes in as milliseconds of a monotonic clock and piles up in an
+    accumulator, out of which one ``TICK`` is due every gravity interval. The
+    game speed therefore follows the clock however irregularly ``ticks()`` is
+    called: late calls catch up on the ticks they missed, at most
+    ``MAX_CATCH_UP`` at once, the rest of a longer backlog being dropped.
+    """
+    MAX_CATCH_UP = 5
+    LINE_WAIT = 500
+    # Past level 999 the interval stops shrinking.
+    MIN_INTERVAL = 1
+
+    def __init__(self, game, now=0.0):
+        self.game = game
+        self.last = now
+        self.accumulator = 0.0
+
+    def interval(self):
+        """Return the milliseconds until the next tick is due."""
+        if self.game.isWaitingAfterLine:
+            return GravityClock.LINE_WAIT
+        return max(GravityClock.MIN_INTERVAL, 1000 // (1 + self.game.level))
+
+    def restart(self):
+        """Start the current interval over, e.g. when waiting after lines."""
+        self.accumulator = 0.0
+
+    def resume(self, now):
+        """Skip the time since the last call, e.g. after a pause."""
+        self.last = now
+
+    def ticks(self, now):
+        """Yield once for each tick due by ``now``.
+
+        The caller applies each tick before iterating again, since the tick
+        may change the interval to the next one.
+        """
+        self.accumulator += now - self.last
+        self.last = now
+        for _ in range(GravityClock.MAX_CATCH_UP):
+            interval = self.interval()
+            if self.accumulator < interval:
+                return
+            self.accumulator -= interval
+            yield
+        self.accumulator %= self.interval()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Tetrix replays
+
+A *TetrixGame* is fully determined by its seed and the actions fed to it, so
+a game can be recorded as the seed plus the timestamped actions coming from
+the key presses and the gravity timer. *TetrixRecorder* captures them while
+the game is played, together with the sequence of dropped pieces and the
+final score, and *TetrixRecording* stores all of it in a compact binary log.
+
+``replay()`` re-runs a log headlessly at full speed and checks that the same
+pieces and score come out, which takes milliseconds instead of wall-clock
+game time. Run this module with log files as arguments to verify them::
+
+    python tetrixreplay.py game.ttrx
+"""
+import struct
+
+from tetrixcore import ActionEnum, TetrixGame
+
+
+class ReplayError(Exception):
+    """A replay diverged from its recording."""
+
+
+class TetrixRecording:
+    """The seed, actions and outcome of one recorded game.
+
+    ``events`` is a list of ``(timestamp, action)`` pairs, the timestamp being
+    in milliseconds since the start of the game, and ``pieces`` holds the
+    shape of every dropped piece in order. Version 1 logs predate wells of
+    other sizes and are always ``BOARD_WIDTH`` x ``BOARD_HEIGHT``, and logs
+    before version 3 predate the 7-bag piece sequence.
+    """
+    MAGIC = b"TTRX"
+    VERSION = 3
+    HEADER = struct.Struct("<4sBQIIII")
+    SIZE = struct.Struct("<HH")
+    FLAGS = struct.Struct("<B")
+    EVENT = struct.Struct("<IB")
+
+    FLAG_BAG = 0x01
+
+    def __init__(self, seed, events=None, pieces=None, score=0,
+        numLinesRemoved=0, width=TetrixGame.BOARD_WIDTH,
+        height=TetrixGame.BOARD_HEIGHT, bag=False):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.bag = bag
+        self.events = [] if events is None else events
+        self.pieces = bytearray() if pieces is None else bytearray(pieces)
+        self.score = score
+        self.numLinesRemoved = numLinesRemoved
+
+    def duration(self):
+        return self.events[-1][0] if self.events else 0
+
+    def toBytes(self):
+        header = TetrixRecording.HEADER.pack(
+            TetrixRecording.MAGIC, TetrixRecording.VERSION, self.seed,
+            len(self.events), len(self.pieces), self.score,
+            self.numLinesRemoved)
+        size = TetrixRecording.SIZE.pack(self.width, self.height)
+        flags = TetrixRecording.FLAGS.pack(
+            TetrixRecording.FLAG_BAG if self.bag else 0)
+        events = b"".join(
+            TetrixRecording.EVENT.pack(timestamp, action)
+            for timestamp, action in self.events)
+        return header + size + flags + events + bytes(self.pieces)
+
+    @classmethod
+    def fromBytes(cls, data):
+        (magic, version, seed, numEvents, numPieces, score,
+            numLinesRemoved) = TetrixRecording.HEADER.unpack_from(data)
+        if magic != TetrixRecording.MAGIC:
+            raise ValueError("not a Tetrix recording")
+        if not 1 <= version <= TetrixRecording.VERSION:
+            raise ValueError(f"unsupported recording version {version}")
+
+        offset = TetrixRecording.HEADER.size
+        width, height = TetrixGame.BOARD_WIDTH, TetrixGame.BOARD_HEIGHT
+        if version >= 2:
+            width, height = TetrixRecording.SIZE.unpack_from(data, offset)
+            offset += TetrixRecording.SIZE.size
+        flags = 0
+        if version >= 3:
+            flags, = TetrixRecording.FLAGS.unpack_from(data, offset)
+            offset += TetrixRecording.FLAGS.size
+        end = offset + numEvents*TetrixRecording.EVENT.size
+        events = [(timestamp, ActionEnum(action)) for timestamp, action in
+            TetrixRecording.EVENT.iter_unpack(data[offset:end])]
+        pieces = data[end:end + numPieces]
+        if len(pieces) != numPieces:
+            raise ValueError("truncated Tetrix recording")
+        return cls(seed, events, pieces, score, numLinesRemoved, width, height,
+            bool(flags & TetrixRecording.FLAG_BAG))
+
+    def save(self, path):
+        with open(path, "wb") as stream:
+            stream.write(self.toBytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as stream:
+            return cls.fromBytes(stream.read())
+
+
+class TetrixRecorder:
+    """Record the actions fed to a game.
+
+    The game must be fresh, i.e. not started since it was created, because
+    only then is it reproducible from its seed.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.recording = TetrixRecording(
+            game.seed, width=game.board.width, height=game.board.height,
+            bag=game.bag)
+
+    def start(self):
+        self.game.start()
+
+    def step(self, actions, timestamp):
+        """Apply ``actions`` to the game, recording them at ``timestamp``."""
+        game = self.game
+        events = self.recording.events
+        score = game.score
+        for action in actions:
+            events.append((timestamp, action))
+            stepPiece(game, action, self.recording.pieces)
+        self.recording.score = game.score
+        self.recording.numLinesRemoved = game.numLinesRemoved
+        return game.score - score
+
+
+def stepPiece(game, action, pieces):
+    """Apply one action, appending the shape of a dropped piece to ``pieces``."""
+    shape = game.curPiece.shape()
+    numPiecesDropped = game.numPiecesDropped
+    game.step((action,))
+    if game.numPiecesDropped != numPiecesDropped:
+        pieces.append(shape)
+
+
+def replay(recording):
+    """Re-run ``recording`` headlessly and return the resulting game.
+
+    Raises *ReplayError* when the pieces or the score differ from the ones
+    recorded.
+    """
+    game = TetrixGame(
+        recording.seed, recording.width, recording.height, recording.bag)
+    game.start()
+    pieces = bytearray()
+    for _, action in recording.events:
+        index = len(pieces)
+        stepPiece(game, action, pieces)
+        if len(pieces) != index and (index >= len(recording.pieces) or
+            pieces[index] != recording.pieces[index]):
+            raise ReplayError(f"piece {index + 1} differs from the recording")
+
+    if len(pieces) != len(recording.pieces):
+        raise ReplayError(
+            f"{len(pieces)} pieces dropped, recorded {len(recording.pieces)}")
+    if (game.score, game.numLinesRemoved) != (
+        recording.score, recording.numLinesRemoved):
+        raise ReplayError(
+            f"score {game.score} with {game.numLinesRemoved} lines, recorded "
+            f"{recording.score} with {recording.numLinesRemoved} lines")
+    return game
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    status = 0
+    for path in sys.argv[1:]:
+        recording = TetrixRecording.load(path)
+        t0 = time.perf_counter()
+        try:
+            game = replay(recording)
+        except ReplayError as error:
+            print(f"{path}: FAILED: {error}")
+            status = 1
+            continue
+        elapsed = (time.perf_counter() - t0) * 1000
+        print(f"{path}: score {game.score}, {game.numLinesRemoved} lines, "
+            f"{game.numPiecesDropped} pieces, replayed in {elapsed:.1f} ms "
+            f"(recorded {recording.duration() / 1000:.1f} s)")
+    sys.exit(status)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Tetrix instrumentation
+
+*TetrixStats* collects timings of the game loop: how long painting, gravity
+ticks and the game rules take, and how far the real tick intervals drift
+from the requested ones. Every series is kept in a *RingHistogram*, which
+only remembers the latest samples so that the memory used stays bounded
+however long the game runs, while its percentiles follow the recent
+behaviour.
+
+The module is Qt-free. *TetrixBoard* only feeds it when instrumentation is
+turned on, with the ``--profile FILE`` option of ``tetrix.py``, and draws an
+overlay of ``overlayText()``; the stats are dumped as JSON on exit.
+"""
+import collections
+import contextlib
+import functools
+import json
+import time
+
+
+class RingHistogram:
+    """The latest ``capacity`` samples of a series, and its total count."""
+
+    def __init__(self, capacity=1024):
+        self.samples = collections.deque(maxlen=capacity)
+        self.count = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+    def percentile(self, p):
+        """Return the ``p``-th percentile of the samples, or None if empty."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(p / 100 * len(ordered)))
+        return ordered[index]
+
+    def mean(self):
+        if not self.samples:
+            return None
+        return sum(self.samples) / len(self.samples)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": max(self.samples) if self.samples else None,
+        }
+
+
+class TetrixStats:
+    """Named series of durations in milliseconds, plus a frame rate.
+
+    Durations are measured with ``time.perf_counter()``.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.series = {}
+        self.frames = collections.deque(maxlen=capacity)
+
+    def histogram(self, name):
+        histogram = self.series.get(name)
+        if histogram is None:
+            histogram = RingHistogram(self.capacity)
+            self.series[name] = histogram
+        return histogram
+
+    def record(self, name, value):
+        self.histogram(name).add(value)
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """Record the duration of the ``with`` block as ``name``."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000)
+
+    def instrument(self, obj, *names):
+        """Time every call of the methods ``names`` of ``obj``.
+
+        The methods are wrapped on the instance only, so other instances of
+        the class run untouched.
+        """
+        for name in names:
+            method = getattr(obj, name)
+
+            @functools.wraps(method)
+            def wrapper(*args, method=method, name=name, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self.record(name, (time.perf_counter() - t0) * 1000)
+
+            setattr(obj, name, wrapper)
+
+    def frame(self):
+        """Count a rendered frame."""
+        self.frames.append(time.perf_counter())
+
+    def fps(self):
+        """Return the frame rate over the last second of frames."""
+        now = time.perf_counter()
+        recent = [t for t in self.frames if now - t <= 1.0]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / (recent[-1] - recent[0])
+
+    def summary(self):
+        stats = {name: histogram.summary()
+            for name, histogram in sorted(self.series.items())}
+        stats["fps"] = self.fps()
+        return stats
+
+    def overlayText(self):
+        """Return the lines of the on-board overlay."""
+
+        def ms(value):
+            return "-" if value is None else f"{value:.1f}"
+
+        lines = [f"{self.fps():.0f} fps, p50/p99"]
+        for name, label in (("paintEvent", "paint"), ("jitter", "jitter")):
+            histogram = self.series.get(name)
+            if histogram is not None:
+                lines.append(f"{label} {ms(histogram.percentile(50))}/"
+                    f"{ms(histogram.percentile(99))} ms")
+        return lines
+
+    def dump(self, path):
+        with open(path, "w") as stream:
+            json.dump(self.summary(), stream, indent=2)
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 import sys
-import math
 import random
 from tkinter import Toplevel
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from ballistics import Trajectory
+
 
 class LCDRange(QtWidgets.QWidget):
 
@@ -65,6 +66,11 @@ class LCDRange(QtWidgets.QWidget):
         self.label.setText(text)
 
 
+def bounds(rect):
+    """Return the inclusive ``(left, top, right, bottom)`` of a QRect."""
+    return rect.left(), rect.top(), rect.right(), rect.bottom()
+
+
 class CannonField(QtWidgets.QWidget):
 
     angleChanged = QtCore.Signal(int)
@@ -84,6 +90,8 @@ class CannonField(QtWidgets.QWidget):
             self.moveShot)
         self.shootAngle = 0
         self.shootForce = 0
+        self.trajectory = None
+        self.impact = None
         self.target = QtCore.QPoint(0, 0)
         self.gameEnded = False
         self.setPalette(QtGui.QPalette(QtGui.QColor(250, 250, 200)))
@@ -121,9 +129,18 @@ class CannonField(QtWidgets.QWidget):
         self.timerCount = 0
         self.shootAngle = self.currentAngle
         self.shootForce = self.currentForce
+        self.trajectory = Trajectory(self.shootAngle, self.shootForce,
+            CannonField.GRAVITY, CannonField.barrelRect.right()+5)
+        self.solveShot()
         self.autoShootTimer.start(5)
         self.emit(QtCore.SIGNAL("canShoot(bool)"), False)
 
+    def solveShot(self):
+        """Work out at which tick and how the shot in flight ends."""
+        self.impact = self.trajectory.impact(
+            self.width(), self.height(), bounds(self.targetRect()),
+            ())
+
     firstTime = True
 
     def newTarget(self):
@@ -154,18 +171,17 @@ class CannonField(QtWidgets.QWidget):
     def moveShot(self):
         region = QtGui.QRegion(self.shotRect())
         self.timerCount += 1
-        shotR = self.shotRect()
 
-        if shotR.intersects(self.targetRect()):
+        tick, isHit = self.impact
+        if self.timerCount >= tick:
             self.autoShootTimer.stop()
-            self.emit(QtCore.SIGNAL("hit()"))
-            self.emit(QtCore.SIGNAL("canShoot(bool)"), True)
-        elif shotR.x() > self.width() or shotR.y() > self.height():
-            self.autoShootTimer.stop()
-            self.emit(QtCore.SIGNAL("missed()"))
+            if isHit:
+                self.emit(QtCore.SIGNAL("hit()"))
+            else:
+                self.emit(QtCore.SIGNAL("missed()"))
             self.emit(QtCore.SIGNAL("canShoot(bool)"), True)
         else:
-            region = region.united(QtGui.QRegion(shotR))
+            region = region.united(QtGui.QRegion(self.shotRect()))
 
         self.update(region)
 
@@ -194,6 +210,7 @@ class CannonField(QtWidgets.QWidget):
         painter.drawRect(self.targetRect())
 
     barrelRect = QtCore.QRect(33, -4, 15, 8)
+    GRAVITY = 4.0
 
     def paintCannon(self, painter: QtGui.QPainter):
         painter.setPen(QtCore.Qt.NoPen)
@@ -212,21 +229,10 @@ class CannonField(QtWidgets.QWidget):
         return result
 
     def shotRect(self):
-        gravity = 4.0
-
-        time = self.timerCount / 40.0
-        velocity = self.shootForce
-        radians = self.shootAngle * math.pi / 180
-
-        vx = velocity * math.cos(radians)
-        vy = velocity * math.sin(radians)
-        x0 = (CannonField.barrelRect.right()+5)*math.cos(radians)
-        y0 = (CannonField.barrelRect.right()+5)*math.sin(radians)
-        x = x0 + vx*time
-        y = y0 + vy*time -0.5*gravity*time*time
-        result = QtCore.QRect(0, 0, 6, 6)
-        result.moveCenter(QtCore.QPoint(round(x), self.height()-1-round(y)))
-        return result
+        left, top, right, bottom = self.trajectory.shotRect(
+            self.timerCount, self.height())
+        return QtCore.QRect(
+            QtCore.QPoint(left, top), QtCore.QPoint(right, bottom))
 
     def targetRect(self):
         result = QtCore.QRect(0, 0, 20, 10)
@@ -237,6 +243,12 @@ class CannonField(QtWidgets.QWidget):
     def gameOver(self):
         return self.gameEnded
 
+    def resizeEvent(self, event):
+        # The shot ends at the edges of the field, wherever they now are.
+        if self.isShooting():
+            self.solveShot()
+        super(CannonField, self).resizeEvent(event)
+
     def isShooting(self):
         return self.autoShootTimer.isActive()
 
@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+import argparse
+import functools
 import sys
 import math
 import random
@@ -6,6 +8,10 @@ from PySide6 import QtCore
 from PySide6 import QtGui
 from PySide6 import QtWidgets
 
+from ballistics import SHOT_SIZE, Trajectory
+from cannonbatch import Salvo, hitMap
+from cannonscore import ScoreModel
+
 
 class LCDRange(QtWidgets.QWidget):
 
@@ -31,14 +37,8 @@ class LCDRange(QtWidgets.QWidget):
         self.label.setSizePolicy(
             QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Fixed)
 
-        self.connect(
-            self.slider, QtCore.SIGNAL("valueChanged(int)"),
-            lcd, QtCore.SLOT("display(int)")
-        )
-        self.connect(
-            self.slider, QtCore.SIGNAL("valueChanged(int)"),
-            self, QtCore.SIGNAL("valueChanged(int)")
-        )
+        self.slider.valueChanged.connect(lcd.display)
+        self.slider.valueChanged.connect(self.valueChanged)
         layout = QtWidgets.QVBoxLayout()
         layout.addWidget(lcd)
         layout.addWidget(self.slider)
@@ -71,6 +71,90 @@ class LCDRange(QtWidgets.QWidget):
         self.label.setText(text)
 
 
+PREVIEW_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=PREVIEW_CACHE_SIZE)
+def previewPath(angle, force, gravity, muzzle, width, height, obstacles):
+    """Return the path of the shot centre until the shot would end.
+
+    The path only depends on its arguments, so it is built once and reused
+    by every frame aiming the same way; the target is left out.
+    """
+    trajectory = Trajectory(angle, force, gravity, muzzle)
+    end, _ = trajectory.impact(width, height, None, obstacles)
+    path = QtGui.QPainterPath()
+    path.moveTo(*trajectory.center(0, height))
+    for tick in range(1, end + 1):
+        path.lineTo(*trajectory.center(tick, height))
+    return path
+
+
+def frameInterval(widget):
+    """Return the frame period of the screen of ``widget``, in ms."""
+    screen = widget.screen()
+    rate = screen.refreshRate() if screen is not None else 0
+    return max(1, round(1000 / (rate if rate > 0 else 60)))
+
+
+def bounds(rect):
+    """Return the inclusive ``(left, top, right, bottom)`` of a QRect."""
+    return rect.left(), rect.top(), rect.right(), rect.bottom()
+
+
+class RangeBinding(QtCore.QObject):
+    """Two-way binding of an *LCDRange* to a value of the *CannonField*.
+
+    The first value of a slider burst is applied right away and the latest
+    of the others once per frame, so a drag repaints the field at most at
+    the frame rate. The values the field sends back are shown on the range
+    without being sent to the field again.
+    """
+
+    def __init__(self, lcdRange, setter, changed, parent=None):
+        super(RangeBinding, self).__init__(parent)
+        self.lcdRange = lcdRange
+        self.setter = setter
+        self.value = None
+        self.echoing = False
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(frameInterval(lcdRange))
+        self.timer.timeout.connect(self.flush)
+        lcdRange.valueChanged.connect(self.queue)
+        changed.connect(self.echo)
+
+    @QtCore.Slot(int)
+    def queue(self, value):
+        if self.echoing:
+            return
+        if self.timer.isActive():
+            self.value = value
+        else:
+            self.setter(value)
+            self.timer.start()
+
+    @QtCore.Slot()
+    def flush(self):
+        if self.value is not None:
+            value = self.value
+            self.value = None
+            self.setter(value)
+            self.timer.start()
+
+    @QtCore.Slot(int)
+    def echo(self, value):
+        # The field is ahead of any value still queued.
+        self.value = None
+        if value == self.lcdRange.value():
+            return
+        self.echoing = True
+        try:
+            self.lcdRange.setValue(value)
+        finally:
+            self.echoing = False
+
+
 class CannonField(QtWidgets.QWidget):
 
     angleChanged = QtCore.Signal(int)
@@ -78,6 +162,7 @@ class CannonField(QtWidgets.QWidget):
     hit = QtCore.Signal()
     missed = QtCore.Signal()
     canShoot = QtCore.Signal(bool)
+    salvoHit = QtCore.Signal(int)
 
     def __init__(self, parent=None):
         super(CannonField, self).__init__(parent)
@@ -85,17 +170,29 @@ class CannonField(QtWidgets.QWidget):
         self.currentAngle = 45
         self.currentForce = 0
         self.timerCount = 0
-        self.autoShootTimer = QtCore.QTimer(self)
-        self.connect(
-            self.autoShootTimer, QtCore.SIGNAL("timeout()"), self.moveShot
-        )
+        self.frameTimer = QtCore.QTimer(self)
+        self.frameTimer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.frameTimer.timeout.connect(self.frame)
+        self.impactTimer = QtCore.QTimer(self)
+        self.impactTimer.setSingleShot(True)
+        self.impactTimer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.impactTimer.timeout.connect(self.endShot)
+        self.shotClock = QtCore.QElapsedTimer()
+        self.animated = True
+        self.salvo = Salvo(CannonField.GRAVITY, CannonField.barrelRect.right()+5)
+        self.salvoClock = QtCore.QElapsedTimer()
+        self.salvoTicks = 0
         self.shootAngle = 0
         self.shootForce = 0
+        self.trajectory = None
+        self.impact = None
         self.target = QtCore.QPoint(0, 0)
         self.gameEnded = False
         self.barrelPressed = False
+        self.scene = None
         self.setPalette(QtGui.QPalette(QtGui.QColor(2550, 250, 200)))
-        self.setAutoFillBackground(True)
+        # The scene pixmap covers the whole widget, background included.
+        self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
         self.newTarget()
 
     def angle(self):
@@ -108,8 +205,8 @@ class CannonField(QtWidgets.QWidget):
         if self.currentAngle == angle:
             return
         self.currentAngle = angle
-        self.update()
-        self.emit(QtCore.SIGNAL("angleChanged(int)"), self.currentAngle)
+        self.invalidateScene()
+        self.angleChanged.emit(self.currentAngle)
 
     def force(self):
         return self.currentForce
@@ -120,7 +217,9 @@ class CannonField(QtWidgets.QWidget):
         if self.currentForce == frc:
             return
         self.currentForce = frc
-        self.emit(QtCore.SIGNAL("forceChanged(int)"), self.currentForce)
+        if self.barrelPressed:
+            self.update()
+        self.forceChanged.emit(self.currentForce)
 
     @QtCore.Slot()
     def shoot(self):
@@ -129,8 +228,137 @@ class CannonField(QtWidgets.QWidget):
         self.timerCount = 0
         self.shootAngle = self.currentAngle
         self.shootForce = self.currentForce
-        self.autoShootTimer.start(5)
-        self.emit(QtCore.SIGNAL("canShoot(bool)"), False)
+        self.trajectory = Trajectory(self.shootAngle, self.shootForce,
+            CannonField.GRAVITY, CannonField.barrelRect.right()+5)
+        self.shotClock.start()
+        self.solveShot()
+        if self.animated:
+            self.startFrames()
+        self.canShoot.emit(False)
+
+    def solveShot(self):
+        """Work out at which tick and how the shot in flight ends.
+
+        The end of the shot is scheduled right away, so the ticks in between
+        only animate it.
+        """
+        self.impact = self.trajectory.impact(
+            self.width(), self.height(), bounds(self.targetRect()),
+            [bounds(self.barrierRect())])
+        tick, _ = self.impact
+        remaining = tick * CannonField.TICK_INTERVAL - self.shotClock.elapsed()
+        self.impactTimer.start(max(0, remaining))
+
+    def setAnimated(self, animated):
+        """Turn the animation of the shots on or off.
+
+        Without animation a shot is only scheduled to end, at the same time,
+        and nothing is painted while it flies.
+        """
+        self.animated = animated
+        if animated and self.isShooting():
+            self.startFrames()
+        self.update()
+
+    def startFrames(self):
+        """Start the frame timer, paced to the refresh rate of the screen."""
+        if not self.frameTimer.isActive():
+            self.frameTimer.start(frameInterval(self))
+
+    @QtCore.Slot()
+    def frame(self):
+        """Bring the shots to where they are by now and repaint them once.
+
+        The positions follow the time elapsed since the shots were fired,
+        whatever the number of frames in between.
+        """
+        region = QtGui.QRegion()
+        animating = self.isShooting() and self.animated
+        if animating:
+            region = region.united(self.moveShot())
+        if len(self.salvo):
+            region = region.united(self.moveSalvo())
+        if not animating and not len(self.salvo):
+            self.frameTimer.stop()
+        if self.animated and not region.isEmpty():
+            self.update(region)
+
+    @QtCore.Slot(int)
+    def shootSalvo(self, count):
+        """Fire ``count`` shots at once, scattered around the aim.
+
+        The shots of a salvo are not scored: they only report how many of
+        them hit the target with ``salvoHit``.
+        """
+        if self.gameEnded or count <= 0:
+            return
+        spread = CannonField.SALVO_SPREAD
+        angles = [min(85, max(5,
+            self.currentAngle + random.uniform(-spread, spread)))
+            for _ in range(count)]
+        forces = [max(0, self.currentForce + random.uniform(-spread, spread))
+            for _ in range(count)]
+        if not len(self.salvo):
+            self.salvoClock.start()
+            self.salvoTicks = 0
+        self.salvo.fire(angles, forces)
+        self.startFrames()
+
+    def moveSalvo(self):
+        """Play the salvo ticks due by now; return the region to repaint.
+
+        Every tick is stepped, so that no shot flies through the target or
+        the barrier between two frames.
+        """
+        before = self.salvoBounds()
+        due = self.salvoClock.elapsed() // CannonField.TICK_INTERVAL
+        target = bounds(self.targetRect())
+        barrier = [bounds(self.barrierRect())]
+        hits = 0
+        while self.salvoTicks < due and len(self.salvo):
+            hits += self.salvo.step(
+                self.width(), self.height(), target, barrier)
+            self.salvoTicks += 1
+        if hits:
+            self.salvoHit.emit(hits)
+        return QtGui.QRegion(before.united(self.salvoBounds()))
+
+    def clearSalvo(self):
+        self.salvo.remove(self.salvo.ticks >= 0)
+
+    def salvoBounds(self):
+        """Return the rectangle around the shots of the salvo and trails."""
+        result = QtCore.QRect()
+        for ago, _ in CannonField.TRAIL:
+            x, y = self.salvoRects(ago)
+            if not len(x):
+                continue
+            result = result.united(QtCore.QRect(
+                QtCore.QPoint(int(x.min()), int(y.min())),
+                QtCore.QPoint(int(x.max()) + SHOT_SIZE - 1,
+                    int(y.max()) + SHOT_SIZE - 1)))
+        return result
+
+    def hitMap(self):
+        """Return the *HitMap* of the sliders grid in the field as it is."""
+        return hitMap(self.width(), self.height(), CannonField.GRAVITY,
+            CannonField.barrelRect.right()+5, (bounds(self.barrierRect()),))
+
+    @QtCore.Slot()
+    def autoAim(self):
+        """Aim with the hitting shot closest to the current aim.
+
+        Returns False, leaving the aim alone, when no shot hits the target.
+        """
+        solutions = self.hitMap().solutions(bounds(self.targetRect()))
+        if not solutions:
+            return False
+        angle, force = min(solutions,
+            key=lambda shot: ((shot[0] - self.currentAngle)**2 +
+                (shot[1] - self.currentForce)**2))
+        self.setAngle(angle)
+        self.setForce(force)
+        return True
 
     firstTime = True
 
@@ -144,49 +372,71 @@ class CannonField(QtWidgets.QWidget):
             200 + random.randint(0, 190-1),
              10 + random.randint(0, 255-1)
         )
-        self.update()
+        self.invalidateScene()
 
     def setGameOver(self):
         if self.gameEnded:
             return
         if self.isShooting():
-            self.autoShootTimer.stop()
+            self.impactTimer.stop()
+        self.clearSalvo()
+        self.frameTimer.stop()
         self.gameEnded = True
-        self.update()
+        self.invalidateScene()
 
     def restartGame(self):
         if self.isShooting():
-            self.autoShootTimer.stop()
+            self.impactTimer.stop()
+        self.clearSalvo()
+        self.frameTimer.stop()
         self.gameEnded = False
-        self.update()
-        self.emit(QtCore.SIGNAL("canShoot(bool)"), True)
+        self.invalidateScene()
+        self.canShoot.emit(True)
 
-    @QtCore.Slot()
     def moveShot(self):
-        region = QtGui.QRegion(self.shotRect())
-        self.timerCount += 1
-
-        shotR = self.shotRect()
-
-        if shotR.intersects(self.targetRect()):
-            self.autoShootTimer.stop()
-            self.emit(QtCore.SIGNAL("hit()"))
-            self.emit(QtCore.SIGNAL("canShoot(bool)"), True)
-        elif (shotR.x() > self.width() or shotR.y() > self.height() or
-             shotR.intersects(self.barrierRect())):
-             self.autoShootTimer.stop()
-             self.emit(QtCore.SIGNAL("missed()"))
-             self.emit(QtCore.SIGNAL("canShoot(bool)"), True)
-        else:
-            region = region.united(QtGui.QRegion(shotR))
+        """Move the shot to its current tick; return the region to repaint.
+
+        The shot stops short of its impact tick, when the impact timer ends
+        it.
+        """
+        region = self.shotRegion()
+        tick, _ = self.impact
+        self.timerCount = min(
+            self.shotClock.elapsed() // CannonField.TICK_INTERVAL, tick - 1)
+        return region.united(self.shotRegion())
+
+    def shotRegion(self):
+        """Return the region of the shot and its trail."""
+        region = QtGui.QRegion()
+        for tick, _ in self.trailTicks():
+            region = region.united(QtGui.QRegion(self.shotRect(tick)))
+        return region
+
+    def trailTicks(self):
+        """Return the ``(tick, alpha)`` of the trail dots, shot included."""
+        return [(self.timerCount - ago, alpha)
+            for ago, alpha in CannonField.TRAIL
+            if ago <= self.timerCount]
 
-        self.update(region)
+    @QtCore.Slot()
+    def endShot(self):
+        region = self.shotRegion()
+        tick, isHit = self.impact
+        self.timerCount = tick
+        if isHit:
+            self.hit.emit()
+        else:
+            self.missed.emit()
+        self.canShoot.emit(True)
+        if self.animated:
+            self.update(region)
 
     def mousePressEvent(self, event: QtCore.QEvent):
         if event.button() != QtCore.Qt.LeftButton:
             return
         if self.barrelHit(event.position().toPoint()):
             self.barrelPressed = True
+            self.update()
 
     def mouseMoveEvent(self, event: QtCore.QEvent):
         if not self.barrelPressed:
@@ -200,11 +450,33 @@ class CannonField(QtWidgets.QWidget):
         self.setAngle(round(rad * 180 / math.pi))
 
     def mouseReleaseEvent(self, event: QtCore.QEvent):
-        if event.button() == QtCore.Qt.LeftButton:
+        if event.button() == QtCore.Qt.LeftButton and self.barrelPressed:
             self.barrelPressed = False
+            self.update()
 
     def paintEvent(self, event: QtCore.QEvent):
+        if (self.scene is None or
+                self.scene.devicePixelRatio() != self.devicePixelRatioF()):
+            self.scene = self.renderScene()
         painter = QtGui.QPainter(self)
+        # Only the exposed region of the scene is blitted, so a shot frame
+        # costs its own rectangles.
+        painter.drawPixmap(0, 0, self.scene)
+
+        if self.barrelPressed:
+            self.paintPreview(painter)
+        if self.isShooting() and self.animated:
+            self.paintShot(painter)
+        if len(self.salvo) and self.animated:
+            self.paintSalvo(painter)
+
+    def renderScene(self):
+        """Return a pixmap of everything but the shots."""
+        dpr = self.devicePixelRatioF()
+        pixmap = QtGui.QPixmap(self.size()*dpr)
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(self.palette().color(QtGui.QPalette.Window))
+        painter = QtGui.QPainter(pixmap)
 
         if self.gameEnded:
             painter.setPen(QtCore.Qt.black)
@@ -213,15 +485,48 @@ class CannonField(QtWidgets.QWidget):
 
         self.paintCannon(painter)
         self.paintBarrier(painter)
-        if self.isShooting():
-            self.paintShot(painter)
         if not self.gameEnded:
             self.painterTarget(painter)
+        painter.end()
+        return pixmap
+
+    def invalidateScene(self):
+        """Have the scene rendered again for the next paint."""
+        self.scene = None
+        self.update()
+
+    def paintPreview(self, painter: QtGui.QPainter):
+        path = previewPath(self.currentAngle, self.currentForce,
+            CannonField.GRAVITY, CannonField.barrelRect.right()+5,
+            self.width(), self.height(), (bounds(self.barrierRect()),))
+        painter.setPen(QtGui.QPen(QtCore.Qt.darkGray, 1, QtCore.Qt.DashLine))
+        painter.setBrush(QtCore.Qt.NoBrush)
+        painter.drawPath(path)
 
     def paintShot(self, painter: QtGui.QPainter):
         painter.setPen(QtCore.Qt.NoPen)
-        painter.setBrush(QtCore.Qt.black)
-        painter.drawRect(self.shotRect())
+        for tick, alpha in reversed(self.trailTicks()):
+            painter.setBrush(QtGui.QColor(0, 0, 0, alpha))
+            painter.drawRect(self.shotRect(tick))
+
+    def paintSalvo(self, painter: QtGui.QPainter):
+        painter.setPen(QtCore.Qt.NoPen)
+        for ago, alpha in reversed(CannonField.TRAIL):
+            x, y = self.salvoRects(ago)
+            painter.setBrush(QtGui.QColor(0, 0, 0, alpha))
+            painter.drawRects([QtCore.QRect(left, top, SHOT_SIZE, SHOT_SIZE)
+                for left, top in zip(x.tolist(), y.tolist())])
+
+    def salvoRects(self, ago=0):
+        """Return the corners of the salvo shots ``ago`` ticks earlier.
+
+        The shots younger than that have no trail dot yet.
+        """
+        x, y = self.salvo.shotRects(self.height(), ago)
+        if ago:
+            old = self.salvo.ticks >= ago
+            x, y = x[old], y[old]
+        return x, y
 
     def painterTarget(self, painter: QtGui.QPainter):
         painter.setPen(QtCore.Qt.black)
@@ -234,6 +539,13 @@ class CannonField(QtWidgets.QWidget):
         painter.drawRect(self.barrierRect())
 
     barrelRect = QtCore.QRect(33, -4, 15, 8)
+    GRAVITY = 9.8
+    # Milliseconds per tick of the shots; frames play the ticks due by then.
+    TICK_INTERVAL = 5
+    # Scatter of the angles and forces of a salvo.
+    SALVO_SPREAD = 5
+    # The ticks ago and opacities of the shots and their fading trails.
+    TRAIL = ((0, 255), (3, 150), (6, 100), (9, 60), (12, 30))
 
     def paintCannon(self, painter: QtGui.QPainter):
         painter.setPen(QtCore.Qt.NoPen)
@@ -251,25 +563,13 @@ class CannonField(QtWidgets.QWidget):
         result.moveBottomLeft(self.rect().bottomLect())
         return result
 
-    def shotRect(self):
-        gravity = 9.8   # XXX
-        t = self.timerCount / 40.0
-        velocity = self.shootForce
-        angle = self.shootAngle * math.pi / 180
-
-        vx = velocity * math.cos(angle)
-        vy = velocity * math.sin(angle)
-        x0 = (CannonField.barrelRect.right()+5)*math.cos(angle)
-        y0 = (CannonField.barrelRect.right()+5)*math.sin(angle)
-
-        x = x0 + vx*t
-        y = y0 + vy*t -0.5*gravity*t*t 
-
-        result = QtCore.QRect(0, 0, 6, 6)
-        result.moveCenter(
-            QtCore.QPoint(round(x), self.height()-1-round(y))
-        )
-        return result
+    def shotRect(self, tick=None):
+        if tick is None:
+            tick = self.timerCount
+        left, top, right, bottom = self.trajectory.shotRect(
+            tick, self.height())
+        return QtCore.QRect(
+            QtCore.QPoint(left, top), QtCore.QPoint(right, bottom))
 
     def targetRect(self):
         result = QtCore.QRect(0, 0, 20, 10)
@@ -291,8 +591,15 @@ class CannonField(QtWidgets.QWidget):
     def gameOver(self):
         return self.gameEnded
 
+    def resizeEvent(self, event):
+        self.scene = None
+        # The shot ends at the edges of the field, wherever they now are.
+        if self.isShooting():
+            self.solveShot()
+        super(CannonField, self).resizeEvent(event)
+
     def isShooting(self):
-        return self.autoShootTimer.isActive()
+        return self.impactTimer.isActive()
 
     def sizeHint(self):
         return QtCore.QSize(400, 300)
@@ -306,10 +613,7 @@ class GameBoard(QtWidgets.QWidget):
         quit = QtWidgets.QPushButton("&Quit")
         quit.setFont(QtGui.QFont("Times", 18, QtGui.QFont.Bold))
 
-        self.connect(
-            quit, QtCore.SIGNAL("clicked()"),
-            root, QtCore.SLOT("quit()")
-        )
+        quit.clicked.connect(root.quit)
 
         angle = LCDRange("ANGLE")
         angle.setRange(5, 85)
@@ -324,39 +628,27 @@ class GameBoard(QtWidgets.QWidget):
         self.cannonField = CannonField()
 
         # --
-        self.connect(
-            angle, QtCore.SIGNAL("valueChanged(int)"),
-            self.cannonField.setAngle
-        )
-        self.connect(
-            self.cannonField, QtCore.SIGNAL("angleChanged(int)"),
-            angle.setValue
-        )
-        self.connect(
-            frc, QtCore.SIGNAL("valueChanged(int)"),
-            self.cannonField.setForce
-        )
-        self.connect(
-            self.cannonField, QtCore.SIGNAL("forceChanged(int)"),
-            frc.setValue
-        )
-        self.connect(self.cannonField, QtCore.SIGNAL("hit()"), self.hit)
-        self.connect(self.cannonField, QtCore.SIGNAL("missed()"), self.missed)
+        self.angleBinding = RangeBinding(angle, self.cannonField.setAngle,
+            self.cannonField.angleChanged, self)
+        self.forceBinding = RangeBinding(frc, self.cannonField.setForce,
+            self.cannonField.forceChanged, self)
+        self.cannonField.hit.connect(self.hit)
+        self.cannonField.missed.connect(self.missed)
 
         shoot = QtWidgets.QPushButton("&Shoot")
         shoot.setFont(QtGui.QFont("Times", 18, QtGui.QFont.Bold))
-        self.connect(shoot, QtCore.SIGNAL("clicked()"), self.fire)
-        self.connect(
-            self.cannonField, QtCore.SIGNAL("canShoot(bool)"),
-            shoot, QtCore.SLOT("setEnabled(bool)")
-        )
+        shoot.clicked.connect(self.fire)
+        self.cannonField.canShoot.connect(shoot.setEnabled)
 
         restart = QtWidgets.QPushButton("&New Game")
         restart.setFont(QtGui.QFont("Times", 18, QtGui.QFont.Bold))
-        self.connect(restart, QtCore.SIGNAL("clicked()"), self.newGame)
+        restart.clicked.connect(self.newGame)
 
         self.hits = QtWidgets.QLCDNumber(2)
         self.shotsLeft = QtWidgets.QLCDNumber(2)
+        self.score = ScoreModel(
+            lambda notify: QtCore.QTimer.singleShot(0, notify))
+        self.score.subscribe(self.showScore)
         hitsLabel = QtWidgets.QLabel("HITS")
         shotsLeftLabel = QtWidgets.QLabel("SHOTS LEFT")
 
@@ -369,8 +661,17 @@ class GameBoard(QtWidgets.QWidget):
             self, self.fire
         )
         QtGui.QShortcut(
-            QtGui.QKeySequence(QtCore.Qt.CTRL + QtCore.Qt.Key_Q),
-            self, QtCore.SLOT("close()")
+            QtGui.QKeySequence(QtCore.Qt.Key_A),
+            self, self.cannonField.autoAim
+        )
+        self.salvoSize = 200
+        QtGui.QShortcut(
+            QtGui.QKeySequence(QtCore.Qt.Key_B),
+            self, lambda: self.cannonField.shootSalvo(self.salvoSize)
+        )
+        QtGui.QShortcut(
+            QtGui.QKeySequence(QtCore.Qt.CTRL | QtCore.Qt.Key_Q),
+            self, self.close
         )
 
         topLayout = QtWidgets.QHBoxLayout()
@@ -406,35 +707,48 @@ class GameBoard(QtWidgets.QWidget):
     def fire(self):
         if self.cannonField.gameOver() or self.cannonField.isShooting():
             return
-        self.shotsLeft.display(self.shotsLeft.intValue()-1)
+        self.score.fire()
         self.cannonField.shoot()
 
     @QtCore.Slot()
     def hit(self):
-        self.hits.display(self.hits.intValue()+1)
-        if self.shotsLeft.intValue() == 0:
+        self.score.hit()
+        if self.score.isLastShot():
             self.cannonField.setGameOver()
         else:
             self.cannonField.newTarget()
 
     @QtCore.Slot()
     def missed(self):
-        if self.shotsLeft.intValue() == 0:
+        if self.score.isLastShot():
             self.cannonField.setGameOver()
 
     @QtCore.Slot()
     def newGame(self):
-        self.shotsLeft.display(15)
-        self.hits.display(0)
+        self.score.newGame()
         self.cannonField.restartGame()
         self.cannonField.newTarget()
 
+    def showScore(self, score):
+        self.hits.display(score.hits)
+        self.shotsLeft.display(score.shotsLeft)
+
 def main():
-    root = QtWidgets.QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Cannon game")
+    parser.add_argument("--no-animation", action="store_true",
+        help="do not animate the shots, only report how they end")
+    parser.add_argument("--salvo", type=int, default=200, metavar="N",
+        help="number of shots fired at once with the B key (default: 200)")
+    args, qtArgs = parser.parse_known_args()
+
+    root = QtWidgets.QApplication(sys.argv[:1] + qtArgs)
     board = GameBoard(root)
+    board.cannonField.setAnimated(not args.no_animation)
+    board.salvoSize = args.salvo
     board.setGeometry(100, 100, 500, 355)
     board.show()
     sys.exit(root.exec())
 
 
-main()
+if __name__ == "__main__":
+    main()